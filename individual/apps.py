@@ -43,7 +43,18 @@ DEFAULT_CONFIG = {
     ],
     "individual_base_fields": [
         'first_name', 'last_name', 'dob', 'location_name', 'location_code', 'id'
-    ]
+    ],
+    "enable_streaming_import": False,
+    "import_chunk_size": 10000,
+    "data_source_bulk_create_batch_size": 1000,
+    "enable_async_import": False,
+    "enable_parallel_validation": False,
+    "validation_worker_count": 4,
+    "allowed_locations_cache_timeout": 3600,
+    "enable_location_ancestry_filter": False,
+    "enable_bulk_group_materialization": False,
+    "group_code_sequence": False,
+    "import_workflow_chunk_size": 0,
 }
 
 
@@ -87,6 +98,17 @@ class IndividualConfig(AppConfig):
     individual_mask_fields = None
     individual_masking_enabled = None
     individual_base_fields = None
+    enable_streaming_import = None
+    import_chunk_size = None
+    data_source_bulk_create_batch_size = None
+    enable_async_import = None
+    enable_parallel_validation = None
+    validation_worker_count = None
+    allowed_locations_cache_timeout = None
+    enable_location_ancestry_filter = None
+    enable_bulk_group_materialization = None
+    group_code_sequence = None
+    import_workflow_chunk_size = None
 
     def ready(self):
         from core.models import ModuleConfiguration
@@ -94,6 +116,8 @@ class IndividualConfig(AppConfig):
         cfg = ModuleConfiguration.get_or_default(self.name, DEFAULT_CONFIG)
         self.__load_config(cfg)
         self.__validate_individual_schema(cfg)
+        self.__compile_individual_schema()
+        self.__connect_location_cache_signals()
         self.__initialize_custom_filters()
         self._set_up_workflows()
         self.__register_masking_class()
@@ -121,6 +145,27 @@ class IndividualConfig(AppConfig):
             error_messages = [error['message'] for error in errors]
             logging.error('Schema validation errors in individual schema: %s', ', '.join(error_messages))
 
+    @classmethod
+    def __compile_individual_schema(cls):
+        from django.db.models.signals import post_save
+        from core.models import ModuleConfiguration
+        from individual.compiled_schema import get_individual_schema, on_module_configuration_change
+
+        try:
+            get_individual_schema()
+        except ValueError as exc:
+            logging.error('Individual schema is not a valid JSON: %s', exc)
+        post_save.connect(
+            on_module_configuration_change,
+            sender=ModuleConfiguration,
+            dispatch_uid='individual_schema_on_module_configuration_change'
+        )
+
+    @classmethod
+    def __connect_location_cache_signals(cls):
+        from individual.location_cache import connect_signals
+        connect_signals()
+
     @classmethod
     def __initialize_custom_filters(cls):
         from individual.custom_filters import (
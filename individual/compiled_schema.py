@@ -0,0 +1,56 @@
+"""
+Parsed individual schema shared across the module.
+The schema is compiled once and rebuilt only when its source in IndividualConfig changes.
+"""
+import json
+import logging
+
+from individual.apps import IndividualConfig
+
+logger = logging.getLogger(__name__)
+
+# Columns accepted in the uploads on top of the schema properties
+ADDITIONAL_IMPORT_HEADERS = ('recipient_info', 'group_code', 'individual_role')
+
+_compiled_schema = None
+
+
+class CompiledIndividualSchema:
+
+    def __init__(self, source: str):
+        self.source = source
+        self.schema = json.loads(source) if source else {}
+        self.properties = self.schema.get('properties', {})
+        self.unique_fields = [field for field, props in self.properties.items() if "uniqueness" in props]
+        self.calculation_fields = [
+            field for field, props in self.properties.items() if "validationCalculation" in props
+        ]
+        self.header_whitelist = frozenset(self.properties) | frozenset(ADDITIONAL_IMPORT_HEADERS)
+
+
+def get_individual_schema() -> CompiledIndividualSchema:
+    global _compiled_schema
+    source = IndividualConfig.individual_schema
+    if _compiled_schema is None or _compiled_schema.source != source:
+        _compiled_schema = CompiledIndividualSchema(source)
+    return _compiled_schema
+
+
+def on_module_configuration_change(sender, instance, **kwargs):
+    """
+    Receiver of ModuleConfiguration post_save, reloads the individual schema of the backend configuration.
+    """
+    if instance.module != IndividualConfig.name or instance.layer != 'be':
+        return
+    try:
+        individual_schema = json.loads(instance.config).get('individual_schema')
+    except (TypeError, ValueError, AttributeError) as exc:
+        logger.error("Invalid individual module configuration, schema not reloaded: %s", exc)
+        return
+    if individual_schema is None:
+        return
+    IndividualConfig.individual_schema = individual_schema
+    try:
+        get_individual_schema()
+    except ValueError as exc:
+        logger.error("Individual schema is not a valid JSON: %s", exc)
@@ -1,4 +1,3 @@
-import json
 import logging
 import re
 
@@ -9,6 +8,7 @@ from typing import List
 
 from core.custom_filters import CustomFilterWizardInterface
 from individual.apps import IndividualConfig
+from individual.compiled_schema import get_individual_schema
 from individual.models import Individual, Group, GroupIndividual
 
 
@@ -32,8 +32,7 @@ class IndividualCustomFilterWizard(CustomFilterWizardInterface):
             if benefit_plan.beneficiary_data_schema and benefit_plan.beneficiary_data_schema != '{}':
                 return self.__process_schema_and_build_tuple(benefit_plan.beneficiary_data_schema, tuple_type)
         if individual_schema:
-            individual_schema_dict = json.loads(individual_schema)
-            return self.__process_schema_and_build_tuple(individual_schema_dict, tuple_type)
+            return self.__process_schema_and_build_tuple(get_individual_schema().schema, tuple_type)
         return []
 
     def apply_filter_to_queryset(self, custom_filters: List[namedtuple], query: QuerySet, relation=None) -> QuerySet:
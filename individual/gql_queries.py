@@ -1,5 +1,6 @@
 import graphene
 from django.contrib.auth.models import AnonymousUser
+from django.utils.dateparse import parse_datetime
 from graphene_django import DjangoObjectType
 import graphene_django_optimizer as gql_optimizer
 
@@ -80,8 +81,37 @@ class IndividualHistoryGQLType(DjangoObjectType):
         return queryset.filter(id__in=accessible_uuids)
 
 
+class IndividualDataSourceUploadStageMetricsGQLType(graphene.ObjectType):
+    stage = graphene.String()
+    rows_total = graphene.Int()
+    rows_processed = graphene.Int()
+    wall_time = graphene.Float()
+    rows_per_second = graphene.Float()
+    started_at = graphene.DateTime()
+    finished_at = graphene.DateTime()
+    failed = graphene.Boolean()
+
+
 class IndividualDataSourceUploadGQLType(DjangoObjectType):
     uuid = graphene.String(source='uuid')
+    stage_metrics = graphene.List(IndividualDataSourceUploadStageMetricsGQLType)
+
+    def resolve_stage_metrics(self, info):
+        # Stages are ordered by their start, jsonb doesn't keep the order of keys
+        metrics = sorted((self.metrics or {}).items(), key=lambda item: item[1].get('started_at') or '')
+        return [
+            IndividualDataSourceUploadStageMetricsGQLType(
+                stage=stage,
+                rows_total=values.get('rows_total'),
+                rows_processed=values.get('rows_processed'),
+                wall_time=values.get('wall_time'),
+                rows_per_second=values.get('rows_per_second'),
+                started_at=parse_datetime(values['started_at']) if values.get('started_at') else None,
+                finished_at=parse_datetime(values['finished_at']) if values.get('finished_at') else None,
+                failed=values.get('failed'),
+            )
+            for stage, values in metrics
+        ]
 
     class Meta:
         model = IndividualDataSourceUpload
@@ -0,0 +1,68 @@
+"""
+Ancestors of the individual and group locations denormalized on the rows, filtering by a parent location
+is then a single indexed equality instead of a chain of self joins on tblLocations.
+Existing rows are populated with the backfill_location_ancestry command.
+"""
+from typing import Dict, Optional
+
+from django.db.models import OuterRef, Q, Subquery
+
+from individual.apps import IndividualConfig
+from location.apps import LocationConfig
+from location.models import Location
+
+# Ancestor columns ordered by the number of levels above the row location, the location itself included.
+# Level names are the ones of the default R, D, W, V hierarchy where individuals and groups live in villages.
+LOCATION_ANCESTRY_FIELDS = ('location', 'location_ward', 'location_district', 'location_region')
+_ANCESTOR_LOOKUPS = ('parent_id', 'parent__parent_id', 'parent__parent__parent_id')
+
+
+def get_location_ancestry(location_id) -> Dict[str, Optional[int]]:
+    """
+    Ancestor columns of a row located in location_id, keyed by attname.
+    """
+    ancestors = None
+    if location_id is not None:
+        ancestors = Location.objects.filter(id=location_id).values_list(*_ANCESTOR_LOOKUPS).first()
+    ancestors = ancestors or (None,) * len(_ANCESTOR_LOOKUPS)
+    return {f'{field}_id': ancestor for field, ancestor in zip(LOCATION_ANCESTRY_FIELDS[1:], ancestors)}
+
+
+def refresh_location_ancestry(queryset) -> int:
+    """
+    Recomputes the ancestor columns of all rows of the queryset with a single UPDATE.
+    Same as QuerySet.update, neither save() nor signals are called and the history is not updated.
+    """
+    return queryset.update(**{
+        f'{field}_id': Subquery(Location.objects.filter(id=OuterRef('location_id')).values(lookup)[:1])
+        for field, lookup in zip(LOCATION_ANCESTRY_FIELDS[1:], _ANCESTOR_LOOKUPS)
+    })
+
+
+def stale_location_ancestry_filter(location) -> Q:
+    """
+    Rows having the location among their ancestors but not its current parent, i.e. rows to be refreshed
+    once the location is moved. Empty for other changes of the location.
+    """
+    stale = Q()
+    for field, parent_field in zip(LOCATION_ANCESTRY_FIELDS, LOCATION_ANCESTRY_FIELDS[1:]):
+        if location.parent_id is None:
+            parent_matches = Q((f'{parent_field}_id__isnull', True))
+        else:
+            parent_matches = Q((f'{parent_field}_id', location.parent_id))
+        stale |= Q((f'{field}_id', location.id)) & ~parent_matches
+    return stale
+
+
+def build_parent_location_filter(parent_location, parent_location_level) -> Optional[Q]:
+    """
+    Filter of the rows located under the parent location with the given uuid, None if the ancestor columns
+    are not enabled or the level is deeper than the denormalized ancestry.
+    """
+    if not IndividualConfig.enable_location_ancestry_filter:
+        return None
+    levels_above = len(LocationConfig.location_types) - parent_location_level - 1
+    if not 0 <= levels_above < len(LOCATION_ANCESTRY_FIELDS):
+        return None
+    field = LOCATION_ANCESTRY_FIELDS[levels_above]
+    return Q((f'{field}_id__in', Location.objects.filter(uuid=parent_location).values('id')))
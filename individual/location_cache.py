@@ -0,0 +1,140 @@
+"""
+Location lookups used by the individual module: village index of the import validation, cached per process,
+and allowed locations of users used by the row level security, cached per request and in the location cache.
+Both are invalidated by versions kept in the location cache and replaced on Location changes.
+"""
+import logging
+import uuid
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from core import filter_validity
+from core.models import InteractiveUser
+from individual.apps import IndividualConfig
+from location.models import Location, LocationManager, UserDistrict, extend_allowed_locations
+
+logger = logging.getLogger(__name__)
+
+cache = caches["location"]
+
+ALLOWED_LOCATIONS_VERSION_CACHE_KEY = "individual_allowed_locations_version"
+VILLAGE_INDEX_VERSION_CACHE_KEY = "individual_village_index_version"
+# Set on the user instance, which usually lives as long as the request, together with the version it was read for
+_REQUEST_CACHE_ATTRIBUTE = "_individual_allowed_location_ids"
+
+_village_index = None
+_village_index_version = None
+
+
+class VillageLocation(NamedTuple):
+    # None if more than one village has the same name and code
+    location_id: Optional[int]
+    district_id: Optional[int]
+    ambiguous: bool
+
+
+def get_village_index() -> Dict[Tuple[str, str], VillageLocation]:
+    """
+    Valid villages keyed by (name, code), built with a single query.
+    The index is rebuilt once the version of the village index changes, see invalidate_village_index.
+    """
+    global _village_index, _village_index_version
+    version = _get_version(VILLAGE_INDEX_VERSION_CACHE_KEY)
+    if _village_index is None or _village_index_version != version:
+        _village_index = _build_village_index()
+        _village_index_version = version
+    return _village_index
+
+
+def _build_village_index():
+    index = {}
+    villages = (
+        Location.objects
+        .filter(type="V", *filter_validity())
+        .values_list('name', 'code', 'id', 'parent__parent_id')
+    )
+    for name, code, location_id, district_id in villages:
+        if (name, code) in index:
+            index[(name, code)] = VillageLocation(None, district_id, True)
+        else:
+            index[(name, code)] = VillageLocation(location_id, district_id, False)
+    return index
+
+
+def build_user_location_filter_query(user, prefix="location") -> Q:
+    """
+    Same filter as LocationManager.build_user_location_filter_query, allowed locations of the user are taken from
+    the cache instead of walking the location tree on every call.
+    """
+    if not isinstance(user, InteractiveUser):
+        logger.warning(f"Access without filter for user {user.id} ")
+        return Q()
+    if user.is_superuser:
+        return Q()
+    return Q((f"{prefix}__in", get_allowed_location_ids(user))) | Q((f"{prefix}__isnull", True))
+
+
+def get_allowed_location_ids(user) -> FrozenSet[int]:
+    """
+    Locations assigned to the user together with all their descendants.
+    The set is kept in the location cache under the user id and the current version of allowed locations,
+    the copy kept on the user instance for the rest of the request is used only while the version is the same.
+    """
+    version = _get_version(ALLOWED_LOCATIONS_VERSION_CACHE_KEY)
+    request_copy = getattr(user, _REQUEST_CACHE_ATTRIBUTE, None)
+    if request_copy is not None and request_copy[0] == version:
+        return request_copy[1]
+
+    # Core users and interactive users have separate ids
+    cache_key = f"individual_allowed_locations_{version}_{type(user).__name__}_{user.id}"
+    allowed = cache.get(cache_key)
+    if allowed is None:
+        allowed = frozenset(extend_allowed_locations(
+            list(LocationManager().get_allowed_ids(user)), True, ["R", "D", "W", "V"]
+        ))
+        cache.set(cache_key, allowed, IndividualConfig.allowed_locations_cache_timeout)
+    setattr(user, _REQUEST_CACHE_ATTRIBUTE, (version, allowed))
+    return allowed
+
+
+def invalidate_allowed_locations(sender=None, **kwargs):
+    """
+    Receiver of Location and UserDistrict changes. Cached entries are not deleted one by one,
+    they're orphaned by the new version and expire after allowed_locations_cache_timeout.
+    """
+    _bump_version(ALLOWED_LOCATIONS_VERSION_CACHE_KEY)
+
+
+def invalidate_village_index(sender=None, **kwargs):
+    """
+    Receiver of Location changes. Indexes of all processes are rebuilt on their next use.
+    """
+    _bump_version(VILLAGE_INDEX_VERSION_CACHE_KEY)
+
+
+def connect_signals():
+    for model in (Location, UserDistrict):
+        post_save.connect(invalidate_allowed_locations, sender=model, dispatch_uid=f"individual_{model.__name__}_save")
+        post_delete.connect(
+            invalidate_allowed_locations, sender=model, dispatch_uid=f"individual_{model.__name__}_delete"
+        )
+    post_save.connect(invalidate_village_index, sender=Location, dispatch_uid="individual_village_index_save")
+    post_delete.connect(invalidate_village_index, sender=Location, dispatch_uid="individual_village_index_delete")
+
+
+def _bump_version(cache_key):
+    cache.set(cache_key, uuid.uuid4().hex, None)
+    # Other processes may rebuild before the change is committed and cache the old rows under the new version
+    transaction.on_commit(lambda: cache.set(cache_key, uuid.uuid4().hex, None))
+
+
+def _get_version(cache_key):
+    version = cache.get(cache_key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(cache_key, version, None)
+    return version
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from individual.location_ancestry import refresh_location_ancestry
+from individual.models import Group, Individual
+
+
+# Django management command to populate the location ancestors of existing individuals and groups
+class Command(BaseCommand):
+    help = "Populate the location ancestors of existing individuals and groups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help="Number of rows updated per transaction"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (Individual, Group):
+            updated = 0
+            last_id = None
+            # Keyset pagination over the primary key, each batch is committed separately
+            while True:
+                ids = model.objects.order_by('id')
+                if last_id is not None:
+                    ids = ids.filter(id__gt=last_id)
+                ids = list(ids.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                with transaction.atomic():
+                    updated += refresh_location_ancestry(model.objects.filter(id__in=ids))
+                last_id = ids[-1]
+
+            self.stdout.write(self.style.SUCCESS(f'Location ancestors populated for {updated} {model.__name__} rows'))
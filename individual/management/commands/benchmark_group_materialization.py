@@ -0,0 +1,97 @@
+import time
+import uuid
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import User
+from individual.models import Individual, GroupDataSource, GroupIndividual
+from individual.services import GroupService, GroupDataSourceMaterializationService, deferred_group_alignment
+from individual.utils import bulk_insert_instances
+
+
+class _Rollback(Exception):
+    pass
+
+
+# Django management command comparing creation of groups from data sources one by one and in bulk
+class Command(BaseCommand):
+    help = "Measure group creation from group data sources, all created data is rolled back"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, required=True, help="User creating the groups")
+        parser.add_argument('--households', type=int, default=50000, help="Number of groups to create")
+        parser.add_argument('--members', type=int, default=4, help="Number of individuals per group")
+        parser.add_argument(
+            '--per-group',
+            action='store_true',
+            help="Measure GroupService.create per group as well, slow for large number of households"
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.get(username=options['username'])
+        households, members = options['households'], options['members']
+
+        self._measure('bulk materialization', user, households, members, self._materialize_in_bulk)
+        if options['per_group']:
+            self._measure('GroupService.create per group', user, households, members, self._create_per_group)
+
+    def _measure(self, name, user, households, members, create_groups):
+        try:
+            with transaction.atomic():
+                data_sources = self._create_data_sources(user, households, members)
+                start = time.perf_counter()
+                create_groups(user, data_sources)
+                elapsed = time.perf_counter() - start
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: {households} households of {members} members in {elapsed:.2f}s '
+            f'({households / elapsed:.0f} households/s)'
+        ))
+
+    @staticmethod
+    def _materialize_in_bulk(user, data_sources):
+        GroupDataSourceMaterializationService(user).materialize(data_sources)
+
+    @staticmethod
+    def _create_per_group(user, data_sources):
+        service = GroupService(user)
+        with deferred_group_alignment(user):
+            for source in data_sources:
+                result = service.create(source.json_ext)
+                source.group_id = result["data"].get('id')
+                source.save(user=user)
+
+    @staticmethod
+    def _create_data_sources(user, households, members):
+        individuals, data_sources = [], []
+        for _ in range(households):
+            household = [
+                Individual(
+                    id=uuid.uuid4(), first_name=uuid.uuid4().hex[:10], last_name=uuid.uuid4().hex[:10],
+                    dob=date(1990, 1, 1), user_created=user, user_updated=user
+                )
+                for _ in range(members)
+            ]
+            individuals.extend(household)
+            individuals_data = [
+                {
+                    'individual_id': str(individual.id),
+                    'role': GroupIndividual.Role.HEAD if i == 0 else GroupIndividual.Role.SON,
+                    'recipient_type': GroupIndividual.RecipientType.PRIMARY if i == 0 else None,
+                }
+                for i, individual in enumerate(household)
+            ]
+            data_sources.append(GroupDataSource(
+                id=uuid.uuid4(), user_created=user, user_updated=user,
+                json_ext={'code': uuid.uuid4().hex[:8], 'individuals_data': individuals_data}
+            ))
+        bulk_insert_instances(Individual, individuals)
+        bulk_insert_instances(GroupDataSource, data_sources)
+        # COPY doesn't mark the instances as saved, save() would insert them again
+        for source in data_sources:
+            source._state.adding = False
+        return data_sources
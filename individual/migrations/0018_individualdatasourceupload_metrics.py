@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0017_remove_historicalindividualdatasourceupload_individual_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="historicalindividualdatasourceupload",
+            name="metrics",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="individualdatasourceupload",
+            name="metrics",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 4.2.16 on 2026-10-17 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("location", "0018_auto_20230925_2243"),
+        ("individual", "0018_individualdatasourceupload_metrics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="group",
+            name="location_district",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="location_region",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="group",
+            name="location_ward",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalgroup",
+            name="location_district",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalgroup",
+            name="location_region",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalgroup",
+            name="location_ward",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalindividual",
+            name="location_district",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalindividual",
+            name="location_region",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="historicalindividual",
+            name="location_ward",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="individual",
+            name="location_district",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="individual",
+            name="location_region",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+        migrations.AddField(
+            model_name="individual",
+            name="location_ward",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="location.location",
+            ),
+        ),
+    ]
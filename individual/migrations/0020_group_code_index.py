@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0019_location_ancestry"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="group",
+            name="code",
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name="historicalgroup",
+            name="code",
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+    ]
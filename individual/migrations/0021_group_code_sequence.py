@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 12:40
+
+from django.db import migrations
+
+
+def create_group_code_sequence(apps, schema_editor):
+    # Used for group codes only when group_code_sequence is enabled, PostgreSQL only
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE SEQUENCE IF NOT EXISTS individual_group_code_seq")
+
+
+def drop_group_code_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP SEQUENCE IF EXISTS individual_group_code_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("individual", "0020_group_code_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_group_code_sequence, reverse_code=drop_group_code_sequence),
+    ]
@@ -1,5 +1,9 @@
+from datetime import datetime
+from itertools import islice
+
 from django.conf import settings
-from django.db import models, transaction
+from django.db import connection, models, transaction
+from django.db.models.sql import UpdateQuery
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
@@ -7,11 +11,32 @@ from django.utils.translation import gettext_lazy as _
 import core
 from core.models import HistoryModel
 from graphql import ResolveInfo
-from location.models import Location, LocationManager
+from individual.apps import IndividualConfig
+from individual.location_ancestry import get_location_ancestry, refresh_location_ancestry, \
+    stale_location_ancestry_filter
+from individual.location_cache import build_user_location_filter_query
+from location.models import Location
+
+
+class LocationAncestryModel(models.Model):
+    """
+    Ancestors of the row location, maintained on save, see individual.location_ancestry.
+    """
+    location_ward = models.ForeignKey(Location, models.DO_NOTHING, blank=True, null=True, related_name='+')
+    location_district = models.ForeignKey(Location, models.DO_NOTHING, blank=True, null=True, related_name='+')
+    location_region = models.ForeignKey(Location, models.DO_NOTHING, blank=True, null=True, related_name='+')
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or 'location' in self.get_dirty_fields(check_relationship=True):
+            for attname, ancestor_id in get_location_ancestry(self.location_id).items():
+                setattr(self, attname, ancestor_id)
+        super().save(*args, **kwargs)
 
+    class Meta:
+        abstract = True
 
 
-class Individual(HistoryModel):
+class Individual(LocationAncestryModel, HistoryModel):
     first_name = models.CharField(max_length=255, null=False)
     last_name = models.CharField(max_length=255, null=False)
     dob = core.fields.DateField(null=False)
@@ -44,11 +69,11 @@ class Individual(HistoryModel):
             return queryset.filter(id=-1)
 
         if not user.is_imis_admin:
-            user_districts_match_individual = LocationManager().build_user_location_filter_query(
+            user_districts_match_individual = build_user_location_filter_query(
                 user._u
             )
             individual_has_group = models.Q(("groupindividuals__group__isnull", False))
-            user_districts_match_individual_group = LocationManager().build_user_location_filter_query(
+            user_districts_match_individual_group = build_user_location_filter_query(
                 user._u,
                 prefix='groupindividuals__group__location'
             )
@@ -76,6 +101,8 @@ class IndividualDataSourceUpload(HistoryModel):
 
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     error = models.JSONField(blank=True, default=dict)
+    # Progress of the import stages (ingestion, validation, workflow), see individual.utils.UploadStageMetrics
+    metrics = models.JSONField(blank=True, default=dict)
 
 
 class IndividualDataSource(HistoryModel):
@@ -92,8 +119,8 @@ class IndividualDataUploadRecords(HistoryModel):
         return f"Individual Import - {self.data_upload.source_name} {self.workflow} {self.date_created}"
 
 
-class Group(HistoryModel):
-    code = models.CharField(max_length=64, blank=False, null=False)
+class Group(LocationAncestryModel, HistoryModel):
+    code = models.CharField(max_length=64, blank=False, null=False, db_index=True)
     json_ext = models.JSONField(db_column="Json_ext", blank=True, default=dict)
     location = models.ForeignKey(
         Location,
@@ -116,7 +143,7 @@ class Group(HistoryModel):
 
         if not user.is_imis_admin:
             return queryset.filter(
-                LocationManager().build_user_location_filter_query(
+                build_user_location_filter_query(
                     user._u
                 )
             )
@@ -124,14 +151,83 @@ class Group(HistoryModel):
 
 @receiver(post_save, sender=Group)
 def update_member_individuals_location(sender, instance, **kwargs):
+    # only update individual location if group location is present,
+    # because individuals import would create a group with empty locaiton which then takes on the location of the head
+    if instance.location_id:
+        relocate_individuals(
+            Individual.objects.filter(groupindividuals__group=instance), instance.location_id, instance.user_updated
+        )
+
+
+def relocate_individuals(individuals, location_id, user):
+    """
+    Moves the individuals to the location with a single UPDATE, see bulk_update_individuals.
+    """
+    return bulk_update_individuals(
+        individuals.exclude(location_id=location_id), user, location_id=location_id, **get_location_ancestry(location_id)
+    )
+
+
+def bulk_update_individuals(individuals, user, **fields):
+    """
+    Updates the individuals with one UPDATE ... RETURNING per batch of data_source_bulk_create_batch_size rows.
+    Individuals are versioned and history records of every batch are created in bulk from the returned rows,
+    the same as if they were saved one by one. Returns the number of updated individuals.
+    Neither save() nor post_save of Individual are called, receivers of other modules aren't notified of the update.
+    """
+    batch_size = IndividualConfig.data_source_bulk_create_batch_size or 1000
+    updated_count = 0
+    now = datetime.now()
     with transaction.atomic():
-        # has to save one-by-one instead of bulk update due to track history
-        for individual in Individual.objects.filter(groupindividuals__group=instance):
-            # only update individual location if group location is present,
-            # because individuals import would create a group with empty locaiton which then takes on the location of the head
-            if instance.location_id and individual.location_id != instance.location_id:
-                individual.location_id=instance.location_id
-                individual.save(user=instance.user_updated)
+        # Ids are streamed, querysets joined with the data sources may repeat an individual
+        ids = individuals.order_by().values_list('id', flat=True).distinct().iterator(chunk_size=batch_size)
+        for batch_ids in iter(lambda: list(islice(ids, batch_size)), []):
+            updated = _update_returning(
+                # Plain queryset, the cached manager answers id__in lookups by loading and caching the rows one by one
+                Individual.objects.all().filter(id__in=batch_ids),
+                **fields,
+                version=models.F('version') + 1,
+                date_updated=now,
+                user_updated=user,
+            )
+            Individual.history.bulk_history_create(updated, update=True, default_user=user)
+            Individual.bulk_update_cache(updated)
+            updated_count += len(updated)
+    return updated_count
+
+
+def _update_returning(queryset, **fields):
+    # Same as queryset.update(), updated rows are returned as model instances without selecting them again
+    model = queryset.model
+    if connection.vendor != 'postgresql':
+        updated_ids = list(queryset.values_list('pk', flat=True))
+        queryset.update(**fields)
+        return list(model.objects.filter(pk__in=updated_ids))
+
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(fields)
+    compiler = query.get_compiler(queryset.db)
+    update_sql, params = compiler.as_sql()
+    concrete_fields = model._meta.concrete_fields
+    returning = ", ".join(connection.ops.quote_name(field.column) for field in concrete_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{update_sql} RETURNING {returning}", params)
+        rows = cursor.fetchall()
+
+    converters = compiler.get_converters([field.get_col(model._meta.db_table) for field in concrete_fields])
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+    attnames = [field.attname for field in concrete_fields]
+    return [model.from_db(queryset.db, attnames, list(row)) for row in rows]
+
+
+@receiver(post_save, sender=Location)
+def update_location_ancestry(sender, instance, created, **kwargs):
+    if created:
+        return
+    stale = stale_location_ancestry_filter(instance)
+    for model in (Individual, Group):
+        refresh_location_ancestry(model.objects.filter(stale))
 
 class GroupDataSource(HistoryModel):
     group = models.ForeignKey(Group, models.DO_NOTHING, blank=True, null=True)
@@ -175,13 +271,15 @@ class GroupIndividual(HistoryModel):
             super().save(user=user)
         else:
             super().save(username=kwargs.get('username'))  
-        from individual.services import GroupAndGroupIndividualAlignmentService
+        from individual.services import GroupAndGroupIndividualAlignmentService, defer_group_alignment
+        if defer_group_alignment(self.group_id):
+            return
         service = GroupAndGroupIndividualAlignmentService(self.user_updated)
         service.handle_head_change(self.id, self.role, self.group_id)
         service.handle_primary_recipient_change(self.id, self.recipient_type, self.group_id)
         service.handle_assure_primary_recipient_in_group(self.group, self.recipient_type)
         service.ensure_location_consistent(self.group, self.individual, self.role)
-        service.update_json_ext_for_group(self.group)
+        service.update_json_ext_for_member(self)
 
     def delete(self, *args, **kwargs):
         user = kwargs.get('user')
@@ -190,9 +288,11 @@ class GroupIndividual(HistoryModel):
         else:
             super().delete(username=kwargs.get('username'))
         
-        from individual.services import GroupAndGroupIndividualAlignmentService
+        from individual.services import GroupAndGroupIndividualAlignmentService, defer_group_alignment
+        if defer_group_alignment(self.group_id, deleted=True):
+            return
         service = GroupAndGroupIndividualAlignmentService(self.user_updated)
-        service.update_json_ext_for_group(self.group)
+        service.update_json_ext_for_member(self)
 
     @classmethod
     def get_queryset(cls, queryset, user):
@@ -207,7 +307,7 @@ class GroupIndividual(HistoryModel):
 
         if not user.is_imis_admin:
             return queryset.filter(
-                LocationManager().build_user_location_filter_query(
+                build_user_location_filter_query(
                     user._u, prefix='group__location'
                 )
             )
@@ -1,4 +1,3 @@
-import json
 import graphene
 import graphene_django_optimizer as gql_optimizer
 import pandas as pd
@@ -12,6 +11,7 @@ from core.schema import OrderedDjangoFilterConnectionField
 from core.services import wait_for_mutation
 from core.utils import append_validity_filter, is_valid_uuid
 from individual.apps import IndividualConfig
+from individual.compiled_schema import get_individual_schema
 from individual.gql_mutations import CreateIndividualMutation, UpdateIndividualMutation, DeleteIndividualMutation, \
     CreateGroupMutation, UpdateGroupMutation, DeleteGroupMutation, CreateGroupIndividualMutation, \
     UpdateGroupIndividualMutation, DeleteGroupIndividualMutation, \
@@ -23,6 +23,7 @@ from individual.gql_queries import IndividualGQLType, IndividualHistoryGQLType,
     IndividualSummaryEnrollmentGQLType, IndividualDataUploadQGLType, \
     GroupIndividualHistoryGQLType, GlobalSchemaType, \
     GroupSummaryEnrollmentGQLType, GroupDataSourceGQLType
+from individual.location_ancestry import build_parent_location_filter
 from individual.models import Individual, IndividualDataSource, Group, \
     GroupIndividual, IndividualDataSourceUpload, IndividualDataUploadRecords, GroupDataSource
 from location.apps import LocationConfig
@@ -448,11 +449,7 @@ class Query(ExportableQueryMixin, graphene.ObjectType):
         )
 
     def resolve_global_schema(self, info):
-        individual_schema = IndividualConfig.individual_schema
-        if individual_schema:
-            individual_schema_dict = json.loads(individual_schema)
-            return GlobalSchemaType(schema=individual_schema_dict)
-        return GlobalSchemaType(schema={})
+        return GlobalSchemaType(schema=get_individual_schema().schema)
 
     @staticmethod
     def _check_permissions(user, perms):
@@ -461,6 +458,9 @@ class Query(ExportableQueryMixin, graphene.ObjectType):
 
     @staticmethod
     def _get_location_filters(parent_location, parent_location_level):
+        ancestry_filter = build_parent_location_filter(parent_location, parent_location_level)
+        if ancestry_filter is not None:
+            return ancestry_filter
         query_key = "uuid"
         for i in range(len(LocationConfig.location_types) - parent_location_level - 1):
             query_key = "parent__" + query_key
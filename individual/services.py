@@ -2,33 +2,53 @@ import logging
 import json
 import uuid
 import pandas as pd
+from collections import defaultdict
+from datetime import datetime
 import concurrent.futures
-import math
+import contextvars
+import multiprocessing
+import django
+from contextlib import contextmanager
+from typing import Iterator
 from pandas import DataFrame
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile
 from django.db import transaction
 
 from calculation.services import get_calculation_object
-from core import filter_validity
 from core.custom_filters import CustomFilterWizardStorage
 from core.models import User
 from core.services import BaseService
 from core.signals import register_service_signal
+from core.utils import DefaultStorageFileHandler
 from django.utils.translation import gettext as _
-from django.db.models import Q, OuterRef, Subquery, Count
+from django.db.models import F, Q, OuterRef, Subquery, Value
+from django.db.models.functions import JSONObject
 from individual.apps import IndividualConfig
+from individual.compiled_schema import get_individual_schema
+from individual.location_cache import get_village_index
+from individual.location_ancestry import get_location_ancestry
 from individual.models import (
+    relocate_individuals,
+    bulk_update_individuals,
     Individual,
     IndividualDataSource,
     GroupIndividual,
     Group,
+    GroupDataSource,
     IndividualDataUploadRecords,
     IndividualDataSourceUpload
 )
 from individual.utils import (
     load_dataframe,
     fetch_summary_of_valid_items,
-    fetch_summary_of_broken_items
+    fetch_summary_of_broken_items,
+    read_csv_in_chunks,
+    read_workbook_in_chunks,
+    split_dataframe,
+    bulk_insert_instances,
+    bulk_update_field,
+    UploadStageMetrics,
+    JSONBMerge,
 )
 from individual.validation import (
     IndividualValidation,
@@ -38,10 +58,11 @@ from individual.validation import (
 )
 from core.services.utils import check_authentication as check_authentication, output_exception, output_result_success, \
     model_representation
-from location.models import Location, LocationManager
+from location.models import LocationManager
 from tasks_management.models import Task
 from tasks_management.services import UpdateCheckerLogicServiceMixin, CreateCheckerLogicServiceMixin, \
     crud_business_data_builder, DeleteCheckerLogicServiceMixin
+from workflow.services import WorkflowService
 from workflow.systems.base import WorkflowHandler
 
 logger = logging.getLogger(__name__)
@@ -177,15 +198,16 @@ class GroupService(
                 if individuals_data:
                     individual_ids = [data["individual_id"] for data in individuals_data]
                     self._update_group_json_ext(group_id, individual_ids)
-                    for data in individuals_data:
-                        obj_data = {
-                            'group_id': group_id,
-                            'individual_id': data.get("individual_id"),
-                            'role': data.get("role"),
-                            'recipient_type': data.get("recipient_type")
-                        }
-                        service = GroupIndividualService(self.user)
-                        service.create(obj_data)
+                    with deferred_group_alignment(self.user):
+                        for data in individuals_data:
+                            obj_data = {
+                                'group_id': group_id,
+                                'individual_id': data.get("individual_id"),
+                                'role': data.get("role"),
+                                'recipient_type': data.get("recipient_type")
+                            }
+                            service = GroupIndividualService(self.user)
+                            service.create(obj_data)
                 return result
         except Exception as exc:
             return output_exception(model_name=self.OBJECT_TYPE.__name__, method="create", exception=exc)
@@ -209,20 +231,23 @@ class GroupService(
                 individual_ids = [data['individual_id'] for data in individuals_data]
                 group = self._update_group_json_ext(group_id, individual_ids)
 
-                for individual_id in assigned_individuals_ids:
-                    if str(individual_id) not in individual_ids:
-                        group_individual = GroupIndividual.objects.get(group_id=group_id, individual_id=individual_id)
-                        service.delete({'id': group_individual.id})
-
-                for data in individuals_data:
-                    if uuid.UUID(data["individual_id"]) not in assigned_individuals_ids:
-                        obj_data = {
-                            'group_id': group_id,
-                            'individual_id': data.get("individual_id"),
-                            'role': data.get("role"),
-                            'recipient_type': data.get("recipient_type")
-                        }
-                        service.create(obj_data)
+                with deferred_group_alignment(self.user):
+                    for individual_id in assigned_individuals_ids:
+                        if str(individual_id) not in individual_ids:
+                            group_individual = GroupIndividual.objects.get(
+                                group_id=group_id, individual_id=individual_id
+                            )
+                            service.delete({'id': group_individual.id})
+
+                    for data in individuals_data:
+                        if uuid.UUID(data["individual_id"]) not in assigned_individuals_ids:
+                            obj_data = {
+                                'group_id': group_id,
+                                'individual_id': data.get("individual_id"),
+                                'role': data.get("role"),
+                                'recipient_type': data.get("recipient_type")
+                            }
+                            service.create(obj_data)
 
                 dict_repr = model_representation(group)
                 return output_result_success(dict_representation=dict_repr)
@@ -236,10 +261,11 @@ class GroupService(
         with transaction.atomic():
             group_id = obj_data.get('id')
             group_individuals = GroupIndividual.objects.filter(group_id=group_id)
-            for group_individual in group_individuals:
-                # cant use .delete() on query since it will completely remove instances from db instead of marking
-                # them as isDeleted
-                group_individual.delete(user=self.user)
+            with deferred_group_alignment(self.user):
+                for group_individual in group_individuals:
+                    # cant use .delete() on query since it will completely remove instances from db instead of marking
+                    # them as isDeleted
+                    group_individual.delete(user=self.user)
             return super().delete(obj_data)
 
     @transaction.atomic
@@ -376,10 +402,60 @@ class GroupIndividualService(BaseService, UpdateCheckerLogicServiceMixin):
         return serialized_data
 
 
+# Keys of the group json_ext maintained from its members, other keys are copied from the head
+GROUP_JSON_EXT_MEMBER_KEYS = (
+    "members", "head", "head_id", "primary_recipient",
+    "primary_recipient_id", "secondary_recipient", "secondary_recipient_id"
+)
+
+_deferred_alignment_group_ids = contextvars.ContextVar('individual_deferred_alignment_group_ids', default=None)
+
+
+@contextmanager
+def deferred_group_alignment(user):
+    """
+    Within the context GroupIndividual saves and deletes skip the GroupAndGroupIndividualAlignmentService hooks,
+    every touched group is aligned once on exit instead, see GroupAndGroupIndividualAlignmentService.align_groups.
+    Nested contexts are merged into the outermost one.
+    """
+    if _deferred_alignment_group_ids.get() is not None:
+        yield
+        return
+    # Touched groups mapped to whether any of their members was saved, not only deleted
+    group_ids = {}
+    token = _deferred_alignment_group_ids.set(group_ids)
+    try:
+        yield
+    finally:
+        _deferred_alignment_group_ids.reset(token)
+    GroupAndGroupIndividualAlignmentService(user).align_groups(
+        group_ids, deleted_only_group_ids={group_id for group_id, saved in group_ids.items() if not saved}
+    )
+
+
+def defer_group_alignment(group_id, deleted=False):
+    """
+    Registers the group to be aligned on exit of deferred_group_alignment, returns False outside of the context.
+    Groups registered only by member deletes are aligned without the role rules, same as the delete hook.
+    """
+    group_ids = _deferred_alignment_group_ids.get()
+    if group_ids is None:
+        return False
+    group_ids[group_id] = group_ids.get(group_id, False) or not deleted
+    return True
+
+
 class GroupAndGroupIndividualAlignmentService:
     """
         Service used in overridden .save() of GroupIndividual model.
     """
+    ALIGNMENT_BATCH_SIZE = 1000
+    # json_ext key, GroupIndividual field and value of the role, whether the role is held by a single member
+    JSON_EXT_ROLES = (
+        ("head", "role", GroupIndividual.Role.HEAD, True),
+        ("primary_recipient", "recipient_type", GroupIndividual.RecipientType.PRIMARY, True),
+        ("secondary_recipient", "recipient_type", GroupIndividual.RecipientType.SECONDARY, False),
+    )
 
     def __init__(self, user):
         self.user = user
@@ -402,10 +478,24 @@ class GroupAndGroupIndividualAlignmentService:
         """
         This method ensures that json_ext of a group is up-to-date with its roles and members.
         """
-        group_individuals = GroupIndividual.objects.filter(group_id=group.id, is_deleted=False)
-        head = group_individuals.filter(role=GroupIndividual.Role.HEAD).first()
-        primary = group_individuals.filter(recipient_type=GroupIndividual.RecipientType.PRIMARY).first()
-        secondary = group_individuals.filter(recipient_type=GroupIndividual.RecipientType.SECONDARY).first()
+        group_individuals = list(
+            GroupIndividual.objects.filter(group_id=group.id, is_deleted=False).select_related('individual')
+        )
+        if self._align_json_ext(group, group_individuals):
+            group.save(update_fields=['json_ext'], user=self.user)
+
+    @staticmethod
+    def _align_json_ext(group, group_individuals):
+        """
+        Updates json_ext of the group in place from its active members, returns whether it has to be saved.
+        """
+        head = next((gi for gi in group_individuals if gi.role == GroupIndividual.Role.HEAD), None)
+        primary = next(
+            (gi for gi in group_individuals if gi.recipient_type == GroupIndividual.RecipientType.PRIMARY), None
+        )
+        secondary = next(
+            (gi for gi in group_individuals if gi.recipient_type == GroupIndividual.RecipientType.SECONDARY), None
+        )
 
         group_members = {
             str(individual.individual.id): f"{individual.individual.first_name} {individual.individual.last_name}"
@@ -423,10 +513,7 @@ class GroupAndGroupIndividualAlignmentService:
         secondary_id = str(secondary.individual.id) if secondary else None
 
         changes_to_save = {}
-        json_ext_minus_keys = {k: v for k, v in group.json_ext.items() if k not in [
-            "members", "head", "head_id", "primary_recipient",
-            "primary_recipient_id", "secondary_recipient", "secondary_recipient_id"
-        ]}
+        json_ext_minus_keys = {k: v for k, v in group.json_ext.items() if k not in GROUP_JSON_EXT_MEMBER_KEYS}
 
         if json_ext_minus_keys != head_json_ext:
             all_keys = set(head_json_ext.keys()).union(json_ext_minus_keys.keys())
@@ -467,8 +554,141 @@ class GroupAndGroupIndividualAlignmentService:
 
         if changes_to_save:
             group.json_ext.update(changes_to_save)
+        return bool(changes_to_save)
+
+    def update_json_ext_for_member(self, group_individual):
+        """
+        Incremental counterpart of update_json_ext_for_group, applies to the group json_ext only the change
+        of the given member. Other members are queried only when the member loses the head or a recipient role.
+        """
+        group = group_individual.group
+        # Saves of other members in the same chain (e.g. the old head) may have updated it in the meantime
+        group.refresh_from_db(fields=['json_ext'])
+        json_ext = dict(group.json_ext or {})
+        individual = group_individual.individual
+        individual_id = str(individual.id)
+        active = not group_individual.is_deleted
+
+        holders = {}
+        for key, field, value, single_holder in self.JSON_EXT_ROLES:
+            holder_id = json_ext.get(f"{key}_id")
+            if active and getattr(group_individual, field) == value:
+                if single_holder or holder_id in (None, individual_id):
+                    holders[key] = individual
+            elif holder_id == individual_id:
+                holder = GroupIndividual.objects.filter(
+                    group_id=group.id, is_deleted=False, **{field: value}
+                ).select_related('individual').first()
+                holders[key] = holder.individual if holder else None
+
+        if "head" in holders:
+            head = holders["head"]
+            head_json_ext = head.json_ext if head and head.json_ext else {}
+            group_keys = {k for k in json_ext if k not in GROUP_JSON_EXT_MEMBER_KEYS}
+            for key in group_keys.union(head_json_ext):
+                value = head_json_ext.get(key)
+                if value is None:
+                    json_ext.pop(key, None)
+                else:
+                    json_ext[key] = value
+
+        members = json_ext.get("members", {})
+        if active and individual_id not in members:
+            json_ext["members"] = {**members, individual_id: f"{individual.first_name} {individual.last_name}"}
+        elif not active and individual_id in members:
+            json_ext["members"] = {k: v for k, v in members.items() if k != individual_id}
+
+        for key, holder in holders.items():
+            json_ext[key] = f"{holder.first_name} {holder.last_name}" if holder else None
+            json_ext[f"{key}_id"] = str(holder.id) if holder else None
+
+        if json_ext != group.json_ext:
+            group.json_ext = json_ext
             group.save(update_fields=['json_ext'], user=self.user)
 
+    def align_groups(self, group_ids, deleted_only_group_ids=()):
+        """
+        Same alignment as done by the GroupIndividual save hooks, for all active members of the groups at once:
+        a single head and primary recipient (the most recently updated member keeps the role), primary recipient
+        assured, member locations consistent with the group and json_ext recomputed.
+        Roles and locations of the members of deleted_only_group_ids are kept, the delete hook doesn't change them.
+        Members of a group that has no location and no located head keep their locations.
+        Members and groups are loaded in batches, each group is saved at most once.
+        """
+        group_ids = list(group_ids)
+        deleted_only_group_ids = set(deleted_only_group_ids)
+        # Saves done by the alignment itself don't need to be aligned again
+        token = _deferred_alignment_group_ids.set({})
+        try:
+            for start in range(0, len(group_ids), self.ALIGNMENT_BATCH_SIZE):
+                self._align_group_batch(group_ids[start:start + self.ALIGNMENT_BATCH_SIZE], deleted_only_group_ids)
+        finally:
+            _deferred_alignment_group_ids.reset(token)
+
+    def _align_group_batch(self, group_ids, deleted_only_group_ids=frozenset()):
+        members_by_group = defaultdict(list)
+        group_individuals = (
+            GroupIndividual.objects
+            .filter(group_id__in=group_ids, is_deleted=False)
+            .select_related('individual')
+            .order_by('date_created')
+        )
+        for group_individual in group_individuals:
+            members_by_group[group_individual.group_id].append(group_individual)
+
+        for group in Group.objects.filter(id__in=group_ids):
+            members = members_by_group[group.id]
+            location_changed = False
+            # The delete hook only recomputes json_ext, roles and locations of the remaining members are kept
+            if group.id not in deleted_only_group_ids:
+                for group_individual in self.apply_role_rules(members, recency=lambda gi: gi.date_updated):
+                    group_individual.save(user=self.user)
+
+                head = next((gi for gi in members if gi.role == GroupIndividual.Role.HEAD), None)
+                if group.location_id is None and head and head.individual.location_id is not None:
+                    # Members are moved to the head location by the Group post_save
+                    group.location_id = head.individual.location_id
+                    location_changed = True
+                elif members and group.location_id is not None:
+                    # Members of a group without location keep theirs
+                    relocate_individuals(
+                        Individual.objects.filter(id__in=[gi.individual_id for gi in members]),
+                        group.location_id,
+                        self.user
+                    )
+
+            if self._align_json_ext(group, members) or location_changed:
+                group.save(user=self.user)
+
+    @staticmethod
+    def apply_role_rules(members, recency=None):
+        """
+        Role rules of the GroupIndividual save hooks applied in place to the members of a group: a single head
+        and primary recipient, the latest holder by recency (list order by default) keeps the role, and
+        a primary recipient assured, the first member becomes the head as well if there is none.
+        Returns the changed members.
+        """
+        changed = []
+        for field, value in (('role', GroupIndividual.Role.HEAD),
+                             ('recipient_type', GroupIndividual.RecipientType.PRIMARY)):
+            holders = [gi for gi in members if getattr(gi, field) == value]
+            if len(holders) < 2:
+                continue
+            latest = max(holders, key=recency) if recency else holders[-1]
+            for group_individual in holders:
+                if group_individual is not latest:
+                    setattr(group_individual, field, None)
+                    changed.append(group_individual)
+
+        if members and not any(gi.recipient_type == GroupIndividual.RecipientType.PRIMARY for gi in members):
+            new_primary = members[0]
+            new_primary.recipient_type = GroupIndividual.RecipientType.PRIMARY
+            if not any(gi.role == GroupIndividual.Role.HEAD for gi in members):
+                new_primary.role = GroupIndividual.Role.HEAD
+            if new_primary not in changed:
+                changed.append(new_primary)
+        return changed
+
     def handle_assure_primary_recipient_in_group(self, group, recipient_type):
         """
             Making sure that group has a head.
@@ -530,6 +750,142 @@ class GroupAndGroupIndividualAlignmentService:
         old_primary.save(user=self.user.user)
 
 
+class GroupDataSourceMaterializationService:
+    """
+    Creates the groups of GroupDataSource rows with set-based inserts, the result is the same as of GroupService.create
+    with deferred_group_alignment: same head, recipient and location rules and the same group json_ext.
+    Groups, memberships and their history records are created in bulk, one history record per created object.
+    The GroupService and GroupIndividualService signals are not sent.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.batch_size = IndividualConfig.data_source_bulk_create_batch_size
+
+    @transaction.atomic
+    def materialize(self, data_sources) -> int:
+        """
+        Creates a group for each data source without an existing group id and links it back to the source.
+        Returns the number of created groups. Raises ValueError if an individual of a source doesn't exist,
+        nothing is created then.
+        """
+        data_sources = [source for source in data_sources if not source.json_ext.get('id')]
+        if not data_sources:
+            return 0
+
+        now = datetime.now()
+        individual_ids = {
+            str(data['individual_id'])
+            for source in data_sources for data in source.json_ext.get('individuals_data') or []
+        }
+        # Plain queryset, the cached manager answers id__in lookups by loading and caching the rows one by one
+        individuals = {
+            str(individual.id): individual
+            for individual in Individual.objects.all().filter(id__in=individual_ids)
+        }
+        location_ancestry = {}
+        relocations = defaultdict(list)
+        groups, group_individuals = [], []
+
+        for source in data_sources:
+            obj_data = dict(source.json_ext)
+            individuals_data = obj_data.pop('individuals_data', None) or []
+            missing_ids = [
+                str(data['individual_id']) for data in individuals_data if str(data['individual_id']) not in individuals
+            ]
+            if missing_ids:
+                # GroupService.create fails on the membership as well, no group is created with part of its members
+                raise ValueError('Individuals of group data source {} not found: {}'.format(
+                    source.id, ', '.join(missing_ids)
+                ))
+            group = Group(**obj_data, **self._new_object_fields(now))
+            members = [
+                GroupIndividual(
+                    group=group,
+                    individual=individuals[str(data['individual_id'])],
+                    role=data.get('role'),
+                    recipient_type=data.get('recipient_type'),
+                    **self._new_object_fields(now)
+                )
+                for data in individuals_data
+            ]
+            GroupAndGroupIndividualAlignmentService.apply_role_rules(members)
+
+            head = next((gi for gi in members if gi.role == GroupIndividual.Role.HEAD), None)
+            if group.location_id is None and head:
+                group.location_id = head.individual.location_id
+            if group.location_id not in location_ancestry:
+                location_ancestry[group.location_id] = get_location_ancestry(group.location_id)
+            for attname, ancestor_id in location_ancestry[group.location_id].items():
+                setattr(group, attname, ancestor_id)
+            if group.location_id is not None:
+                # Members of a group without location keep theirs, as with the deferred alignment
+                relocations[group.location_id].extend(gi.individual_id for gi in members)
+
+            GroupAndGroupIndividualAlignmentService._align_json_ext(group, members)
+            groups.append(group)
+            group_individuals.extend(members)
+            source.group = group
+            source.version += 1
+            source.date_updated = now
+            source.user_updated = self.user
+
+        bulk_insert_instances(Group, groups, batch_size=self.batch_size)
+        Group.history.bulk_history_create(groups, batch_size=self.batch_size, default_user=self.user)
+        bulk_insert_instances(GroupIndividual, group_individuals, batch_size=self.batch_size)
+        GroupIndividual.history.bulk_history_create(
+            group_individuals, batch_size=self.batch_size, default_user=self.user
+        )
+        for location_id, relocated_ids in relocations.items():
+            for start in range(0, len(relocated_ids), self.batch_size):
+                relocate_individuals(
+                    Individual.objects.all().filter(id__in=relocated_ids[start:start + self.batch_size]),
+                    location_id,
+                    self.user
+                )
+
+        # Sources share all updated values except the group, only the group is set row by row
+        bulk_update_field(
+            GroupDataSource, 'group', [(source.id, source.group_id) for source in data_sources], self.batch_size
+        )
+        source_ids = [source.id for source in data_sources]
+        for start in range(0, len(source_ids), self.batch_size):
+            GroupDataSource.objects.all().filter(id__in=source_ids[start:start + self.batch_size]).update(
+                version=F('version') + 1, date_updated=now, user_updated=self.user
+            )
+        GroupDataSource.history.bulk_history_create(
+            data_sources, batch_size=self.batch_size, update=True, default_user=self.user
+        )
+        return len(groups)
+
+    def _new_object_fields(self, now):
+        return {
+            'id': uuid.uuid4(),
+            'user_created': self.user,
+            'user_updated': self.user,
+            'date_created': now,
+            'date_updated': now,
+        }
+
+
+def get_workflow(workflow_name, workflow_group):
+    """
+    Returns the only workflow registered with the name in the group, raises ValueError if there isn't exactly one.
+    """
+    result = WorkflowService.get_workflows(workflow_name, workflow_group)
+    if not result.get('success'):
+        raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
+
+    workflows = result.get('data', {}).get('workflows')
+
+    if not workflows:
+        raise ValueError('Workflow not found: group={} name={}'.format(workflow_group, workflow_name))
+    if len(workflows) > 1:
+        raise ValueError('Multiple workflows found: group={} name={}'.format(workflow_group, workflow_name))
+
+    return workflows[0]
+
+
 class IndividualImportService:
     import_loaders = {
         # .csv
@@ -542,6 +898,19 @@ class IndividualImportService:
         'application/vnd.oasis.opendocument.spreadsheet': lambda f: pd.read_excel(f),
     }
 
+    # Used when streaming import is enabled, every loader yields DataFrames of at most chunk_size rows
+    chunked_import_loaders = {
+        # .csv
+        'text/csv': read_csv_in_chunks,
+        # .xlsx
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': read_workbook_in_chunks,
+        # .xls, legacy format can't be streamed
+        'application/vnd.ms-excel': lambda f, chunk_size: split_dataframe(pd.read_excel(f), chunk_size),
+        # .ods, not supported by the read-only workbook reader
+        'application/vnd.oasis.opendocument.spreadsheet':
+            lambda f, chunk_size: split_dataframe(pd.read_excel(f), chunk_size),
+    }
+
     def __init__(self, user):
         super().__init__()
         self.user = user
@@ -556,15 +925,70 @@ class IndividualImportService:
         self._trigger_workflow(workflow, upload)
         return {'success': True, 'data': {'upload_uuid': upload.uuid}}
 
+    @register_service_signal('individual.import_individuals_async')
+    def import_individuals_async(self,
+                                 import_file: InMemoryUploadedFile,
+                                 workflow: WorkflowHandler,
+                                 group_aggregation_column: str):
+        """
+        Registers the upload and returns immediately. The file has to be already stored under
+        IndividualConfig.get_individual_upload_file_path, it's parsed and saved in the background task.
+        """
+        from individual.tasks import task_import_individuals
+        upload = self._create_upload_entry(import_file.name)
+        self._create_individual_data_upload_records(workflow, upload, group_aggregation_column)
+        task_args = (
+            str(self.user.id), str(upload.uuid), import_file.name, import_file.content_type,
+            workflow.name, workflow.group
+        )
+        transaction.on_commit(lambda: task_import_individuals.delay(*task_args))
+        return {'success': True, 'data': {'upload_uuid': upload.uuid}}
+
+    def import_stored_file(self, upload_id, file_name, content_type, workflow_name, workflow_group):
+        """
+        Background part of import_individuals_async. Progress and failures are reported on the upload status/error.
+        """
+        upload = IndividualDataSourceUpload.objects.get(id=upload_id)
+        file_handler = DefaultStorageFileHandler(IndividualConfig.get_individual_upload_file_path(file_name))
+        try:
+            upload.status = IndividualDataSourceUpload.Status.IN_PROGRESS
+            upload.save(username=self.user.login_name)
+
+            workflow = get_workflow(workflow_name, workflow_group)
+            import_file = SimpleUploadedFile(file_name, file_handler.get_file_content(), content_type=content_type)
+            self._save_upload_sources(upload, import_file)
+        except Exception as exc:
+            logger.error("Error while importing individuals from %s", file_name, exc_info=exc)
+            file_handler.remove_file()
+            # Chunks committed before the failure
+            IndividualDataSource.objects.filter(upload=upload).delete()
+            upload.status = IndividualDataSourceUpload.Status.FAIL
+            upload.error = {'import': str(exc)}
+            upload.save(username=self.user.login_name)
+            return upload
+
+        self._trigger_workflow(workflow, upload)
+        return upload
+
     @transaction.atomic
     def _save_sources(self, import_file):
         # Method separated as workflow execution must be independent of the atomic transaction.
         upload = self._create_upload_entry(import_file.name)
-        dataframe = self._load_import_file(import_file)
-        self._validate_dataframe(dataframe)
-        self._save_data_source(dataframe, upload)
+        self._save_upload_sources(upload, import_file)
         return upload
 
+    def _save_upload_sources(self, upload, import_file):
+        with UploadStageMetrics(upload, 'ingestion') as stage_metrics:
+            if IndividualConfig.enable_streaming_import:
+                self._save_data_source_in_chunks(import_file, upload, stage_metrics)
+            else:
+                with transaction.atomic():
+                    dataframe = self._load_import_file(import_file)
+                    self._validate_dataframe(dataframe)
+                    stage_metrics.rows_total = len(dataframe)
+                    self._save_data_source(dataframe, upload)
+                    stage_metrics.advance(len(dataframe))
+
     @transaction.atomic
     def _create_individual_data_upload_records(self, workflow, upload, group_aggregation_column):
         record = IndividualDataUploadRecords(
@@ -574,8 +998,12 @@ class IndividualImportService:
         )
         record.save(user=self.user.user)
 
-    def validate_import_individuals(self, upload_id: uuid, individual_sources):
-        dataframe = load_dataframe(individual_sources)
+    def validate_import_individuals(self, upload_id: uuid, individual_sources, dataframe: DataFrame = None):
+        """
+        Validates the data sources of the upload. DataFrame of the sources can be provided if it's already loaded.
+        """
+        if dataframe is None:
+            dataframe = load_dataframe(individual_sources)
         validated_dataframe, invalid_items = self._validate_possible_individuals(
             dataframe,
             upload_id
@@ -590,119 +1018,158 @@ class IndividualImportService:
         chunk,
         properties,
         unique_validations,
-        loc_name_code_district_ids_from_db,
+        village_locations,
         user_allowed_loc_ids,
-        duplicate_village_name_code_tuples,
+        calculation=None,
     ):
-        validated_dataframe = []
-        check_location = 'location_name' in chunk.columns
-
-        for _, row in chunk.iterrows():
-            field_validation = {'row': row.to_dict(), 'validations': {}}
-            for field, field_properties in properties.items():
-
-                # Validation Calculation
-                if "validationCalculation" in field_properties and field in row:
-                    field_validation['validations'][field] = IndividualImportService._handle_validation_calculation(row, field, field_properties)
-
-                # Uniqueness Check
-                if "uniqueness" in field_properties and field in row:
-                    field_validation['validations'][f'{field}_uniqueness'] = IndividualImportService._handle_uniqueness(row, field, unique_validations)
-
-            if 'location_name' in chunk.columns:
-                field_validation['validations']['location_name'] = (
-                    IndividualImportService._validate_location(
-                        row.location_name,
-                        row.location_code,
-                        loc_name_code_district_ids_from_db,
-                        user_allowed_loc_ids,
-                        duplicate_village_name_code_tuples,
-                    )
+        """
+        Validates the chunk column by column. Every check returns a list of results aligned with the chunk rows,
+        passing rows share a single success result of the check, dedicated results are built only for failing rows.
+        """
+        column_validations = {}
+        for field, field_properties in properties.items():
+            if field not in chunk.columns:
+                continue
+
+            # Validation Calculation
+            if "validationCalculation" in field_properties:
+                column_validations[field] = IndividualImportService._validate_calculation_column(
+                    chunk[field], field, field_properties, calculation
+                )
+
+            # Uniqueness Check
+            if "uniqueness" in field_properties:
+                column_validations[f'{field}_uniqueness'] = IndividualImportService._validate_uniqueness_column(
+                    chunk[field], field, unique_validations
                 )
 
-            validated_dataframe.append(field_validation)
+        if 'location_name' in chunk.columns:
+            column_validations['location_name'] = IndividualImportService._validate_location_column(
+                chunk,
+                village_locations,
+                user_allowed_loc_ids,
+            )
 
-        return validated_dataframe
+        return [
+            {'row': row, 'validations': {key: results[index] for key, results in column_validations.items()}}
+            for index, row in enumerate(chunk.to_dict('records'))
+        ]
 
     def _validate_possible_individuals(self, dataframe: DataFrame, upload_id: uuid):
-        schema_dict = json.loads(IndividualConfig.individual_schema)
-        properties = schema_dict.get("properties", {})
+        individual_schema = get_individual_schema()
+        properties = individual_schema.properties
 
-        unique_fields = [field for field, props in properties.items() if "uniqueness" in props]
         unique_validations = {}
-        if unique_fields:
+        if individual_schema.unique_fields:
             unique_validations = {
                 field: dataframe[field].duplicated(keep=False) 
-                for field in unique_fields
+                for field in individual_schema.unique_fields
             }
 
         check_location = 'location_name' in dataframe.columns
         if check_location:
             # Issue a single DB query instead of per row for efficiency
-            loc_name_code_district_ids_from_db = self._query_location_district_ids(dataframe)
+            village_locations = self._resolve_village_locations(dataframe)
             user_allowed_loc_ids = LocationManager().get_allowed_ids(self.user)
-            duplicate_village_name_code_tuples = self._query_duplicate_village_name_code()
         else:
-            loc_name_code_district_ids_from_db = None
+            village_locations = None
             user_allowed_loc_ids = None
-            duplicate_village_name_code_tuples = None
 
-        # TODO: Use ProcessPoolExecutor after resolving django dependency loading issue
-        validated_dataframe = IndividualImportService.process_chunk(
-            dataframe,
-            properties,
-            unique_validations,
-            loc_name_code_district_ids_from_db,
-            user_allowed_loc_ids,
-            duplicate_village_name_code_tuples,
-        )
+        validated_dataframe = []
+        with UploadStageMetrics(upload_id, 'validation', rows_total=len(dataframe)) as stage_metrics:
+            validated_chunks = self._process_chunks(
+                dataframe,
+                properties,
+                unique_validations,
+                village_locations,
+                user_allowed_loc_ids,
+                self._get_validation_calculation(individual_schema),
+            )
+            for chunk, validated_chunk in validated_chunks:
+                self.save_validation_error_in_data_source_bulk(validated_chunk)
+                validated_dataframe.extend(validated_chunk)
+                stage_metrics.advance(len(chunk))
 
-        self.save_validation_error_in_data_source_bulk(validated_dataframe)
         invalid_items = fetch_summary_of_broken_items(upload_id)
         return validated_dataframe, invalid_items
 
     @staticmethod
-    def _query_location_district_ids(df):
-        unique_tuples = df[['location_name', 'location_code']].drop_duplicates()
-        query = Q()
-        for _, row in unique_tuples.iterrows():
-            query |= Q(name=row['location_name'], code=row['location_code'])
-        locations = Location.objects.filter(type="V", *filter_validity()).filter(query)
-        return {(loc.name, loc.code): loc.parent.parent.id for loc in locations}
+    def _process_chunks(
+        dataframe,
+        properties,
+        unique_validations,
+        village_locations,
+        user_allowed_loc_ids,
+        calculation,
+    ) -> Iterator:
+        """
+        Yields (chunk, validated chunk) pairs in row order. If parallel validation is enabled, chunks are validated
+        in a pool of worker processes, Django is set up once per worker.
+        """
+        chunks = list(split_dataframe(dataframe, IndividualConfig.import_chunk_size))
+        chunks_args = [
+            (
+                chunk,
+                properties,
+                # Only the part of uniqueness masks matching the chunk is sent to the worker
+                {field: duplicated.loc[chunk.index] for field, duplicated in unique_validations.items()},
+                village_locations,
+                user_allowed_loc_ids,
+                calculation,
+            )
+            for chunk in chunks
+        ]
+
+        if not IndividualImportService._use_parallel_validation(len(chunks)):
+            for chunk_args in chunks_args:
+                yield chunk_args[0], IndividualImportService.process_chunk(*chunk_args)
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(IndividualConfig.validation_worker_count, len(chunks)),
+            # Forked workers would share the database connections of the parent process
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as executor:
+            yield from zip(chunks, executor.map(IndividualImportService.process_chunk, *zip(*chunks_args)))
+
+    @staticmethod
+    def _use_parallel_validation(number_of_chunks):
+        if not IndividualConfig.enable_parallel_validation or IndividualConfig.validation_worker_count < 2:
+            return False
+        if number_of_chunks < 2:
+            return False
+        # Daemonic processes, e.g. celery prefork workers, are not allowed to have children
+        return not multiprocessing.current_process().daemon
 
     @staticmethod
-    def _query_duplicate_village_name_code():
-        return (
-            Location.objects
-            .filter(type="V", *filter_validity())
-            .values('name', 'code')
-            .annotate(name_count=Count('id'))
-            .filter(name_count__gt=1)
-            .values_list('name', 'code')
-        )
+    def _resolve_village_locations(df):
+        # Only locations used in the upload are passed on, chunks may be sent to worker processes
+        village_index = get_village_index()
+        locations = zip(df['location_name'].tolist(), df['location_code'].tolist())
+        return {location: village_index[location] for location in set(locations) if location in village_index}
 
     @staticmethod
     def _validate_location(
         location_name,
         location_code,
-        loc_name_code_district_ids_from_db,
+        village_locations,
         user_allowed_loc_ids,
-        duplicate_village_name_code_tuples
     ):
         result = {
             'field_name': 'location_name',
         }
         if (location_name is None or location_name == "") and (location_code is None or location_code == ""):
             result['success'] = True
-        elif loc_name_code_district_ids_from_db is None and user_allowed_loc_ids is None:
+        elif village_locations is None and user_allowed_loc_ids is None:
             result['success'] = True
-        elif (location_name, location_code) not in loc_name_code_district_ids_from_db:
+        elif (location_name, location_code) not in village_locations:
             result['success'] = False
             result['note'] = f"Location with name '{location_name}' and code '{location_code}' is not valid. Please check the spelling against the list of locations in the system."
-        elif (location_name, location_code) in duplicate_village_name_code_tuples:
+        elif village_locations[(location_name, location_code)].ambiguous:
             result['success'] = False
             result['note'] = f"Location with name '{location_name}' and code '{location_code}' is ambiguous, because there are more than one location with this name and code found in the system."
-        elif loc_name_code_district_ids_from_db[(location_name, location_code)] not in user_allowed_loc_ids:
+        elif village_locations[(location_name, location_code)].district_id not in user_allowed_loc_ids:
             result['success'] = False
             result['note'] = f"Location with name '{location_name}' and code '{location_code}' is outside the current user's location permissions."
         else:
@@ -711,31 +1178,81 @@ class IndividualImportService:
 
 
     @staticmethod
-    def _handle_uniqueness(row, field, unique_validations):
-        success = not unique_validations[field].loc[row.name]
-        result = {
-            "success": success,
-            "field_name": field,
-        }
-        if not success:
-            result["note"] = f"'{field}' Field value '{row[field]}' is duplicated"
-        return result
+    def _validate_location_column(
+        chunk,
+        village_locations,
+        user_allowed_loc_ids,
+    ):
+        # Uploads have only a few distinct locations, each (name, code) pair is validated once
+        results = {}
+        column_results = []
+        for location in zip(chunk['location_name'].tolist(), chunk['location_code'].tolist()):
+            if location not in results:
+                results[location] = IndividualImportService._validate_location(
+                    *location,
+                    village_locations,
+                    user_allowed_loc_ids,
+                )
+            column_results.append(results[location])
+        return column_results
 
+    @staticmethod
+    def _validate_uniqueness_column(column, field, unique_validations):
+        duplicated = unique_validations[field].loc[column.index].to_numpy()
+        success_result = {"success": True, "field_name": field}
+        return [
+            {
+                "success": False,
+                "field_name": field,
+                "note": f"'{field}' Field value '{value}' is duplicated",
+            } if is_duplicated else success_result
+            for value, is_duplicated in zip(column.tolist(), duplicated)
+        ]
 
     @staticmethod
-    def _handle_validation_calculation(row, field, field_properties):
+    def _validate_calculation_column(column, field, field_properties, calculation=None):
         validation_calculation = field_properties.get("validationCalculation", {}).get("name")
         if not validation_calculation:
             raise ValueError("Missing validation name")
         calculation_uuid = IndividualConfig.validation_calculation_uuid
-        calculation = get_calculation_object(calculation_uuid)
-        result_row = calculation.calculate_if_active_for_object(
-            validation_calculation,
-            calculation_uuid,
-            field_name=field,
-            field_value=row[field],
-        )
-        return result_row
+        if calculation is None:
+            calculation = get_calculation_object(calculation_uuid)
+
+        def calculate(value):
+            return calculation.calculate_if_active_for_object(
+                validation_calculation,
+                calculation_uuid,
+                field_name=field,
+                field_value=value,
+            )
+
+        # Columns like national_id_type have only a few distinct values, the rule is evaluated once per value.
+        # Values are keyed together with their type, as 1, 1.0 and True are equal keys the rule may judge differently
+        results = {}
+        column_results = []
+        for value in column.tolist():
+            if pd.isna(value) is True:
+                # NaN isn't equal to itself, missing values are evaluated once per type
+                key = (type(value), None)
+            else:
+                key = (type(value), value)
+            try:
+                hash(key)
+            except TypeError:
+                # Unhashable values can't be memoized
+                column_results.append(calculate(value))
+                continue
+            if key not in results:
+                results[key] = calculate(value)
+            column_results.append(results[key])
+        return column_results
+
+    @staticmethod
+    def _get_validation_calculation(individual_schema):
+        # Resolved once per upload and shared by all the validated chunks
+        if not individual_schema.calculation_fields:
+            return None
+        return get_calculation_object(IndividualConfig.validation_calculation_uuid)
 
     def _create_upload_entry(self, filename):
         upload = IndividualDataSourceUpload(source_name=filename, source_type='individual import')
@@ -754,21 +1271,50 @@ class IndividualImportService:
 
         return self.import_loaders[import_file.content_type](import_file)
 
+    def _load_import_file_in_chunks(self, import_file) -> Iterator[pd.DataFrame]:
+        if import_file.content_type not in self.chunked_import_loaders:
+            raise ValueError("Unsupported content type: {}".format(import_file.content_type))
+
+        return self.chunked_import_loaders[import_file.content_type](import_file, IndividualConfig.import_chunk_size)
+
+    def _save_data_source_in_chunks(self, import_file, upload: IndividualDataSourceUpload,
+                                    stage_metrics: UploadStageMetrics):
+        # Each chunk is persisted before the next one is read, memory usage doesn't depend on the file size.
+        # Chunks of an upload that is already committed (import_stored_file) are committed one by one together with
+        # the progress, so the ingestion can be followed from other connections
+        for chunk in self._load_import_file_in_chunks(import_file):
+            if chunk.empty:
+                continue
+            with transaction.atomic():
+                self._save_data_source(chunk, upload)
+                stage_metrics.advance(len(chunk))
+
+        if not stage_metrics.rows_processed:
+            raise ValueError("Import file is empty")
+        # Number of rows is known only once the whole file is read
+        stage_metrics.rows_total = stage_metrics.rows_processed
+
     def _save_data_source(self, dataframe: pd.DataFrame, upload: IndividualDataSourceUpload):
-        data_source_objects = []
-        
-        for _, row in dataframe.iterrows():
-            ds = IndividualDataSource(
+        # Single serialization pass over the whole frame, encodes NaN/NaT, dates and numpy scalars
+        # the same way as per-row Series.to_json
+        records = json.loads(dataframe.to_json(orient='records'))
+        data_source_objects = [
+            IndividualDataSource(
                 upload=upload,
-                json_ext=json.loads(row.to_json()),
+                json_ext=record,
                 validations={},
                 user_created=self.user,
                 user_updated=self.user,
                 uuid=uuid.uuid4()
             )
-            data_source_objects.append(ds)
+            for record in records
+        ]
 
-        IndividualDataSource.objects.bulk_create(data_source_objects)
+        bulk_insert_instances(
+            IndividualDataSource,
+            data_source_objects,
+            batch_size=IndividualConfig.data_source_bulk_create_batch_size
+        )
 
     def _trigger_workflow(self,
                           workflow: WorkflowHandler,
@@ -789,13 +1335,16 @@ class IndividualImportService:
             if result and isinstance(result, dict) and result.get('success') is False:
                 raise ValueError(result.get('message', 'Unexpected error during the workflow execution'))
         except ValueError as e:
+            # Stage metrics of the workflow run were written directly to the database
+            upload.refresh_from_db(fields=['metrics'])
             upload.status = IndividualDataSourceUpload.Status.FAIL
             upload.error = {'workflow': str(e)}
             upload.save(username=self.user.login_name)
             return upload
 
     def save_validation_error_in_data_source_bulk(self, validated_dataframe):
-        data_sources_to_update = []
+        # Rows keeping the validations of a previous validation run are not updated
+        data_source_validations = []
 
         for field_validation in validated_dataframe:
             row = field_validation['row']
@@ -808,15 +1357,14 @@ class IndividualImportService:
                         "note": value.get('note')
                     })
 
-            data_sources_to_update.append(
-                IndividualDataSource(
-                    id=row['id'],
-                    validations={'validation_errors': error_fields}
-                )
-            )
+            data_source_validations.append((row['id'], {'validation_errors': error_fields}))
 
-        if data_sources_to_update:
-            IndividualDataSource.objects.bulk_update(data_sources_to_update, ['validations'])
+        bulk_update_field(
+            IndividualDataSource,
+            'validations',
+            data_source_validations,
+            batch_size=IndividualConfig.data_source_bulk_create_batch_size
+        )
 
     def create_task_with_importing_valid_items(self, upload_id: uuid):
         if IndividualConfig.enable_maker_checker_for_individual_upload:
@@ -854,19 +1402,12 @@ class IndividualImportService:
             ).run_workflow()
 
     def _synchronize_individual(self, upload_id):
-        individuals_to_update = Individual.objects.filter(
-            individualdatasource__upload=upload_id
+        # Stamped version is the one the individual gets with this update
+        bulk_update_individuals(
+            Individual.objects.filter(individualdatasource__upload=upload_id),
+            self.user.user,
+            json_ext=JSONBMerge('json_ext', JSONObject(report_synch=Value('true'), version=F('version') + 1)),
         )
-        for individual in individuals_to_update:
-            synch_status = {
-                'report_synch': 'true',
-                'version': individual.version + 1,
-            }
-            if individual.json_ext:
-                individual.json_ext.update(synch_status)
-            else:
-                individual.json_ext = synch_status
-            individual.save(user=self.user.user)
 
 
 class IndividualTaskCreatorService:
@@ -1,9 +1,11 @@
 import logging
 import random
 import string
+from collections import defaultdict
 from typing import List
 
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import connection
 from django.db.models import F, Q
 
 from core.models import User
@@ -11,13 +13,14 @@ from individual.apps import IndividualConfig
 from individual.models import (
     IndividualDataSourceUpload,
     IndividualDataSource,
-    IndividualDataUploadRecords, Group, GroupIndividual, Individual, GroupDataSource
+    IndividualDataUploadRecords, Group, GroupIndividual, Individual, GroupDataSource, bulk_update_individuals
 )
-from individual.services import GroupIndividualService, GroupService
+from individual.services import GroupIndividualService, GroupService, GroupDataSourceMaterializationService, \
+    deferred_group_alignment, get_workflow
+from individual.utils import JSONBRemoveKeys
 from tasks_management.apps import TasksManagementConfig
 from tasks_management.models import Task
 from tasks_management.services import TaskService
-from workflow.services import WorkflowService
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +28,7 @@ logger = logging.getLogger(__name__)
 class ItemsUploadTaskCompletionEvent:
     def run_workflow(self):
         group, name = self.workflow_name.split('.')
-        workflow = self._get_workflow(group, name)
+        workflow = get_workflow(name, group)
         result = workflow.run({
             'user_uuid': str(self.user.id),
             'upload_uuid': str(self.upload_id),
@@ -39,18 +42,6 @@ class ItemsUploadTaskCompletionEvent:
                 # Todo: this should be changed to system user
                 data_upload.save(username=data_upload.user_updated.username)
 
-    def _get_workflow(self, group, name):
-        result_workflow = WorkflowService.get_workflows(name, group)
-        if not result_workflow.get('success'):
-            raise ValueError('{}: {}'.format(result_workflow.get("message"), result_workflow.get("details")))
-        workflows = result_workflow.get('data', {}).get('workflows')
-        if not workflows:
-            raise ValueError('Workflow not found: group={} name={}'.format(group, name))
-        if len(workflows) > 1:
-            raise ValueError('Multiple workflows found: group={} name={}'.format(group, name))
-        workflow = workflows[0]
-        return workflow
-
     def __init__(self, workflow: str, upload_record, upload_id: str, user: User, accepted: List[str] = None):
         """
         Workflow name should be in workflow_group.workflow_name notation.
@@ -71,6 +62,7 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
     individuals = None
     group_aggregation_column = None
     grouped_individuals = None
+    member_data = None
 
     def run_workflow(self):
         super().run_workflow()
@@ -114,18 +106,26 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
         if accepted:
             data_sources = data_sources.filter(id__in=accepted)
 
-        service = GroupService(user)
-        for source in data_sources:
-            obj_data = source.json_ext
-            if obj_data.get('id'):
-                result = service.update(obj_data)
-            else:
-                result = service.create(obj_data)
+        if IndividualConfig.enable_bulk_group_materialization:
+            data_sources = list(data_sources)
+            GroupDataSourceMaterializationService(user).materialize(data_sources)
+            # Only sources of existing groups are left to be updated one by one
+            data_sources = [source for source in data_sources if source.group_id is None]
 
-            group_id = result["data"].get('id')
-            if group_id:
-                source.group_id = group_id
-                source.save(username=user.username)
+        service = GroupService(user)
+        # Members of all the groups are aligned once at the end instead of on every GroupIndividual save
+        with deferred_group_alignment(user):
+            for source in data_sources:
+                obj_data = source.json_ext
+                if obj_data.get('id'):
+                    result = service.update(obj_data)
+                else:
+                    result = service.create(obj_data)
+
+                group_id = result["data"].get('id')
+                if group_id:
+                    source.group_id = group_id
+                    source.save(username=user.username)
 
     def set_group_aggregation_column(self, group_aggregation_column):
         if group_aggregation_column == 'null' or not group_aggregation_column:
@@ -147,20 +147,12 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
         )
 
     def _clean_json_ext(self):
-        def clean_json_ext(json_ext):
-            if json_ext is None:
-                return None
-            json_ext.pop(self.group_code_str, None)
-            json_ext.pop(self.recipient_info_str, None)
-            json_ext.pop(self.individual_role_str, None)
-            return json_ext
-
-        for individual in self.individuals:
-            original_json_ext = self._get_json_ext(individual)
-            cleaned_json_ext = clean_json_ext(original_json_ext.copy() if original_json_ext else None)
-            if cleaned_json_ext != original_json_ext:
-                individual.json_ext = cleaned_json_ext
-                individual.save(username=self.user.username)
+        keys = [self.group_code_str, self.recipient_info_str, self.individual_role_str]
+        bulk_update_individuals(
+            Individual.objects.filter(id__in=self.individuals.values('id'), json_ext__has_any_keys=keys),
+            self.user,
+            json_ext=JSONBRemoveKeys('json_ext', keys),
+        )
 
     def _query_individuals(self):
         return Individual.objects.filter(
@@ -174,17 +166,24 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
         return instance.json_ext or {}
 
     def _create_or_update_groups_using_group_code(self):
-        for individual_group in self.grouped_individuals:
+        grouped_individuals = list(self.grouped_individuals)
+        groups_by_code, assigned_individual_ids = self._get_existing_groups(
+            [individual_group['value'] for individual_group in grouped_individuals]
+        )
+        # Member data of all groups, including current members of the existing ones, is read at once
+        self._get_member_data([
+            *(str(uuid) for individual_group in grouped_individuals for uuid in individual_group['record_ids']),
+            *(uuid for ids in assigned_individual_ids.values() for uuid in ids),
+        ])
+
+        for individual_group in grouped_individuals:
             ids = individual_group['record_ids']
             ids_str = [str(uuid) for uuid in ids]
             group_code = individual_group['value']
-            group = Group.objects.filter(code=group_code).first()
+            group = groups_by_code.get(group_code)
 
             if group:
-                assigned_individual_ids = list(Individual.objects.filter(
-                    groupindividuals__group=group, is_deleted=False
-                ).values_list('id', flat=True))
-                assigned_individual_ids_str = [str(uuid) for uuid in assigned_individual_ids]
+                assigned_individual_ids_str = assigned_individual_ids[group.id]
                 updated_ids = list(set(ids_str + assigned_individual_ids_str))
                 update_individuals_data = self._build_individual_data(updated_ids)
                 obj_data = {"id": str(group.id), "individuals_data": update_individuals_data, "code": group_code}
@@ -194,18 +193,55 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
 
             self._create_group_data_source(obj_data)
 
+    @staticmethod
+    def _get_existing_groups(group_codes):
+        """
+        Groups by code, the first one by id if the code is not unique, and ids of their current members.
+        """
+        groups_by_code = {}
+        for group in Group.objects.filter(code__in=set(group_codes)).order_by('id'):
+            groups_by_code.setdefault(group.code, group)
+
+        assigned_individual_ids = defaultdict(list)
+        members = Individual.objects.filter(
+            groupindividuals__group__in=list(groups_by_code.values()), is_deleted=False
+        ).values_list('groupindividuals__group_id', 'id')
+        for group_id, individual_id in members:
+            assigned_individual_ids[group_id].append(str(individual_id))
+        return groups_by_code, assigned_individual_ids
+
     def _build_individual_data(self, ids):
+        member_data = self._get_member_data(ids)
+
         def build_single_individual_data(individual_id):
-            individual = Individual.objects.get(id=individual_id)
-            individual_json_ext = self._get_json_ext(individual)
-            recipient_info = individual_json_ext.get('recipient_info')
-            individual_role = individual_json_ext.get(self.individual_role_str)
+            recipient_info, individual_role = member_data[str(individual_id)]
             individual_role = self._individual_role_parser(individual_role)
             recipient_type = self._recipient_type_parser(recipient_info)
             return {'individual_id': individual_id, 'recipient_type': recipient_type, 'role': individual_role}
 
         return [build_single_individual_data(individual_id) for individual_id in ids]
 
+    def _get_member_data(self, ids):
+        """
+        Recipient info and role from json_ext of the individuals, keyed by individual id.
+        Individuals of the upload are read with a single query shared by all groups, other individuals
+        (current members of existing groups) are read once on demand.
+        """
+        if self.member_data is None:
+            self.member_data = self._query_member_data(self.individuals)
+        missing_ids = [individual_id for individual_id in ids if str(individual_id) not in self.member_data]
+        if missing_ids:
+            self.member_data.update(self._query_member_data(Individual.objects.filter(id__in=missing_ids)))
+        return self.member_data
+
+    def _query_member_data(self, individuals):
+        recipient_info_key = f'json_ext__{self.recipient_info_str}'
+        individual_role_key = f'json_ext__{self.individual_role_str}'
+        return {
+            str(row['id']): (row[recipient_info_key], row[individual_role_key])
+            for row in individuals.values('id', recipient_info_key, individual_role_key)
+        }
+
     @staticmethod
     def _recipient_type_parser(recipient_type):
         if recipient_type in [1, '1', 1.0]:
@@ -223,10 +259,11 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
         data_source.save(username=self.user.username)
 
     def _create_groups(self):
-        for individual_group in self.grouped_individuals:
+        grouped_individuals = list(self.grouped_individuals)
+        codes = self.generate_unique_codes(len(grouped_individuals))
+        for individual_group, code in zip(grouped_individuals, codes):
             ids = individual_group['record_ids']
             ids_str = [str(uuid) for uuid in ids]
-            code = self.generate_unique_code()
             individuals_data = self._build_individual_data(ids_str)
             obj_data = {"individuals_data": individuals_data, "code": code}
             self._create_group_data_source(obj_data)
@@ -234,10 +271,35 @@ class BaseGroupColumnAggregationClass(ItemsUploadTaskCompletionEvent):
     @staticmethod
     def generate_unique_code():
         """Generate a unique 8-digit code."""
-        while True:
-            code = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-            if not Group.objects.filter(code=code).exists():
-                return code
+        return BaseGroupColumnAggregationClass.generate_unique_codes(1)[0]
+
+    @staticmethod
+    def generate_unique_codes(count):
+        """
+        Generate count unique 8-digit codes. Candidates are checked against existing groups with a single query
+        per batch and only the colliding ones are generated again. With group_code_sequence enabled
+        the candidates are consecutive numbers of the individual_group_code_seq database sequence.
+        """
+        codes = {}
+        batch_size = IndividualConfig.data_source_bulk_create_batch_size
+        while len(codes) < count:
+            candidates = [
+                code for code in BaseGroupColumnAggregationClass._code_candidates(min(count - len(codes), batch_size))
+                if code not in codes
+            ]
+            existing = set(Group.objects.filter(code__in=candidates).values_list('code', flat=True))
+            codes.update((code, None) for code in candidates if code not in existing)
+        return list(codes)[:count]
+
+    @staticmethod
+    def _code_candidates(count):
+        if IndividualConfig.group_code_sequence and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval('individual_group_code_seq') FROM generate_series(1, %s)", [count]
+                )
+                return [f'{value:08d}' for value, in cursor.fetchall()]
+        return [''.join(random.choices(string.ascii_letters + string.digits, k=8)) for _ in range(count)]
 
     def _create_task_or_data_source_into_entity(self):
         if IndividualConfig.enable_maker_checker_for_group_upload:
@@ -15,3 +15,13 @@ def task_import_individual_workflow(user_uuid, upload_uuid):
 def task_import_individual_workflow_valid(user_uuid, upload_uuid, percentage_of_invalid_items):
     from individual.workflows.base_individual_upload import import_individual_workflow_valid
     return import_individual_workflow_valid(user_uuid, upload_uuid, percentage_of_invalid_items)
+
+
+@shared_task
+def task_import_individuals(user_uuid, upload_uuid, file_name, content_type, workflow_name, workflow_group):
+    from core.models import User
+    from individual.services import IndividualImportService
+    user = User.objects.get(id=user_uuid)
+    IndividualImportService(user).import_stored_file(
+        upload_uuid, file_name, content_type, workflow_name, workflow_group
+    )
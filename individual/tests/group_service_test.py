@@ -1,10 +1,11 @@
 import copy
 import uuid
+from unittest.mock import patch
 
 from django.test import TestCase
 
-from individual.models import Group, Individual, GroupIndividual
-from individual.services import GroupService
+from individual.models import Group, Individual, GroupIndividual, GroupDataSource
+from individual.services import GroupService, GroupDataSourceMaterializationService
 from individual.tests.data import service_group_update_payload, service_add_individual_payload
 from individual.tests.test_helpers import create_individual
 from core.test_helpers import LogInHelper
@@ -82,6 +83,63 @@ class GroupServiceTest(TestCase):
         self.assertEqual(group.location_id, self.location.id)
         self.assertEqual(grp_ind2.individual.location_id, self.location.id)
 
+    def test_materialize_group_data_sources(self):
+        source = GroupDataSource(json_ext=copy.deepcopy(self.payload_with_individuals))
+        source.save(username=self.data_user.username)
+
+        created = GroupDataSourceMaterializationService(self.user).materialize(GroupDataSource.objects.filter(id=source.id))
+        self.assertEqual(created, 1)
+
+        # Same result as GroupService.create
+        source.refresh_from_db()
+        group = Group.objects.get(id=source.group_id)
+        self.assertEqual(group.code, self.payload_with_individuals['code'])
+        self.assertEqual(group.location_id, self.location.id)
+        self.assertEqual(group.json_ext['head_id'], str(self.individual_1.id))
+        self.assertEqual(group.json_ext['primary_recipient_id'], str(self.individual_1.id))
+        self.assertEqual(group.json_ext['secondary_recipient_id'], str(self.individual_2.id))
+        self.assertEqual(
+            set(group.json_ext['members']), {str(self.individual_1.id), str(self.individual_2.id)}
+        )
+        group_individuals = GroupIndividual.objects.filter(group_id=group.id)
+        for data in self.payload_with_individuals['individuals_data']:
+            group_individual = group_individuals.get(individual_id=data['individual_id'])
+            self.assertEqual(group_individual.role, data['role'])
+            self.assertEqual(group_individual.recipient_type, data['recipient_type'])
+            self.assertEqual(group_individual.individual.location_id, self.location.id)
+
+        self.assertEqual(group.history.count(), 1)
+        self.assertEqual(GroupIndividual.history.filter(group_id=group.id).count(), 2)
+        self.assertEqual(source.version, 2)
+
+    def test_materialize_group_data_sources_without_location(self):
+        json_ext = copy.deepcopy(self.payload_with_individuals)
+        # Head without location, the located member keeps its location
+        json_ext['individuals_data'][0]['role'] = None
+        json_ext['individuals_data'][1]['role'] = 'HEAD'
+        source = GroupDataSource(json_ext=json_ext)
+        source.save(username=self.data_user.username)
+
+        GroupDataSourceMaterializationService(self.user).materialize(GroupDataSource.objects.filter(id=source.id))
+
+        source.refresh_from_db()
+        self.assertIsNone(Group.objects.get(id=source.group_id).location_id)
+        self.assertEqual(Individual.objects.get(id=self.individual_1.id).location_id, self.location.id)
+
+    def test_materialize_group_data_sources_missing_individual(self):
+        json_ext = copy.deepcopy(self.payload_with_individuals)
+        missing_id = str(uuid.uuid4())
+        json_ext['individuals_data'].append({'individual_id': missing_id, 'role': 'SON', 'recipient_type': None})
+        source = GroupDataSource(json_ext=json_ext)
+        source.save(username=self.data_user.username)
+
+        with self.assertRaisesMessage(ValueError, missing_id):
+            GroupDataSourceMaterializationService(self.user).materialize(GroupDataSource.objects.filter(id=source.id))
+
+        source.refresh_from_db()
+        self.assertIsNone(source.group_id)
+        self.assertFalse(Group.objects.filter(code=json_ext['code']).exists())
+
     def test_update_group(self):
         result = self.service.create(self.payload)
         self.assertTrue(result.get('success', False), result.get('detail', "No details provided"))
@@ -118,6 +176,32 @@ class GroupServiceTest(TestCase):
             self.assertEqual(individual.location, new_location)
             self.assertEqual(individual.user_updated, self.user)
             self.assertTrue(individual.date_updated > group.date_updated)
+            history = individual.history.order_by('-history_date').first()
+            self.assertEqual(history.history_type, '~')
+            self.assertEqual(history.location_id, new_location.id)
+            self.assertEqual(history.version, individual.version)
+
+    @patch('individual.models.IndividualConfig.data_source_bulk_create_batch_size', 1)
+    def test_update_group_location_in_batches(self):
+        result = self.service.create(self.payload_with_individuals)
+        self.assertTrue(result.get('success', False), result.get('detail', "No details provided"))
+        group = self.query_all.get(uuid=result.get('data', {}).get('uuid'))
+        individuals = Individual.objects.filter(groupindividuals__group=group)
+        versions = dict(individuals.values_list('id', 'version'))
+        history_counts = {individual.id: individual.history.count() for individual in individuals}
+
+        new_location = create_test_village({'code': 'NEWGULB'})
+        result = self.service.update({'id': group.uuid, 'location_id': str(new_location.id)})
+        self.assertTrue(result.get('success', False), result.get('detail', "No details provided"))
+
+        # Every member is updated once and gets one history record, whatever the batch it was updated in
+        for individual in individuals.all():
+            self.assertEqual(individual.location, new_location)
+            self.assertEqual(individual.version, versions[individual.id] + 1)
+            self.assertEqual(individual.history.count(), history_counts[individual.id] + 1)
+            history = individual.history.order_by('-history_date').first()
+            self.assertEqual(history.location_id, new_location.id)
+            self.assertEqual(history.version, individual.version)
 
     def test_delete_group(self):
         result = self.service.create(self.payload)
@@ -1,11 +1,15 @@
 import csv
+import io
 import json
 import os
 import pandas as pd
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from individual.location_cache import invalidate_village_index
 from individual.services import IndividualImportService
+from individual.utils import UploadStageMetrics
 from individual.models import (
     IndividualDataSource,
     IndividualDataSourceUpload,
@@ -17,6 +21,7 @@ from individual.tests.test_helpers import (
     create_test_village,
     create_test_interactive_user,
     assign_user_districts,
+    create_individual,
 )
 from unittest.mock import MagicMock, patch
 from core.utils import filter_validity
@@ -103,6 +108,208 @@ class IndividualImportServiceTest(TestCase):
         })
 
 
+    @patch('individual.services.IndividualConfig.import_chunk_size', 2)
+    @patch('individual.services.IndividualConfig.enable_streaming_import', True)
+    def test_import_individuals_streaming(self):
+        uploaded_csv_name = f"{generate_random_string(20)}.csv"
+        csv_file = SimpleUploadedFile(
+            uploaded_csv_name,
+            self.csv_content,
+            content_type="text/csv"
+        )
+
+        mock_workflow = self._create_mock_workflow()
+
+        service = IndividualImportService(self.admin_user)
+        result = service.import_individuals(csv_file, mock_workflow, "group_code")
+        self.assertEqual(result['success'], True)
+
+        upload = IndividualDataSourceUpload.objects.get(source_name=uploaded_csv_name)
+        individual_data_sources = IndividualDataSource.objects.filter(upload=upload)
+        num_records = count_csv_records(self.csv_file_path)
+        self.assertEqual(individual_data_sources.count(), num_records)
+
+        expected_first_names = set(pd.read_csv(self.csv_file_path)['first_name'])
+        saved_first_names = {source.json_ext['first_name'] for source in individual_data_sources}
+        self.assertEqual(saved_first_names, expected_first_names)
+
+        ingestion_metrics = upload.metrics['ingestion']
+        self.assertEqual(ingestion_metrics['rows_total'], num_records)
+        self.assertEqual(ingestion_metrics['rows_processed'], num_records)
+        self.assertIsNotNone(ingestion_metrics['finished_at'])
+
+    @patch('individual.tasks.task_import_individuals')
+    def test_import_individuals_async(self, mock_task):
+        uploaded_csv_name = f"{generate_random_string(20)}.csv"
+        csv_file = SimpleUploadedFile(
+            uploaded_csv_name,
+            self.csv_content,
+            content_type="text/csv"
+        )
+
+        mock_workflow = self._create_mock_workflow()
+        mock_workflow.group = 'Test Group'
+
+        service = IndividualImportService(self.admin_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = service.import_individuals_async(csv_file, mock_workflow, "group_code")
+        self.assertEqual(result['success'], True)
+
+        upload = IndividualDataSourceUpload.objects.get(source_name=uploaded_csv_name)
+        self.assertEqual(result['data']['upload_uuid'], upload.uuid)
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.PENDING)
+        self.assertFalse(IndividualDataSource.objects.filter(upload=upload).exists())
+
+        data_upload_record = IndividualDataUploadRecords.objects.get(data_upload=upload)
+        self.assertEqual(data_upload_record.json_ext['group_aggregation_column'], "group_code")
+
+        mock_task.delay.assert_called_once_with(
+            str(self.admin_user.id), str(upload.uuid), uploaded_csv_name, "text/csv", 'Test Workflow', 'Test Group'
+        )
+        mock_workflow.run.assert_not_called()
+
+    @patch('individual.services.WorkflowService')
+    @patch('individual.services.DefaultStorageFileHandler')
+    def test_import_stored_file(self, mock_file_handler, mock_workflow_service):
+        mock_file_handler.return_value.get_file_content.return_value = self.csv_content
+        mock_workflow = self._create_mock_workflow()
+        mock_workflow_service.get_workflows.return_value = {
+            'success': True,
+            'data': {'workflows': [mock_workflow]}
+        }
+
+        upload = IndividualDataSourceUpload(source_name='stored.csv', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+
+        service = IndividualImportService(self.admin_user)
+        service.import_stored_file(upload.uuid, 'stored.csv', 'text/csv', 'Test Workflow', 'Test Group')
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.TRIGGERED)
+        num_records = count_csv_records(self.csv_file_path)
+        self.assertEqual(IndividualDataSource.objects.filter(upload=upload).count(), num_records)
+        mock_workflow.run.assert_called_once_with({
+            'user_uuid': str(self.admin_user.id),
+            'upload_uuid': str(upload.uuid),
+        })
+
+    @patch('individual.services.WorkflowService')
+    @patch('individual.services.DefaultStorageFileHandler')
+    def test_import_stored_file_unsupported_content_type(self, mock_file_handler, mock_workflow_service):
+        mock_file_handler.return_value.get_file_content.return_value = self.csv_content
+        mock_workflow = self._create_mock_workflow()
+        mock_workflow_service.get_workflows.return_value = {
+            'success': True,
+            'data': {'workflows': [mock_workflow]}
+        }
+
+        upload = IndividualDataSourceUpload(source_name='stored.txt', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+
+        service = IndividualImportService(self.admin_user)
+        service.import_stored_file(upload.uuid, 'stored.txt', 'text/plain', 'Test Workflow', 'Test Group')
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.FAIL)
+        self.assertEqual(upload.error, {'import': 'Unsupported content type: text/plain'})
+        mock_file_handler.return_value.remove_file.assert_called_once()
+        mock_workflow.run.assert_not_called()
+        self.assertTrue(upload.metrics['ingestion']['failed'])
+        self.assertIsNone(upload.metrics['ingestion']['finished_at'])
+
+    @patch('individual.services.IndividualConfig.import_chunk_size', 2)
+    @patch('individual.services.IndividualConfig.enable_streaming_import', True)
+    @patch('individual.services.WorkflowService')
+    @patch('individual.services.DefaultStorageFileHandler')
+    def test_import_stored_file_streaming_failure(self, mock_file_handler, mock_workflow_service):
+        mock_file_handler.return_value.get_file_content.return_value = self.csv_content
+        mock_workflow = self._create_mock_workflow()
+        mock_workflow_service.get_workflows.return_value = {
+            'success': True,
+            'data': {'workflows': [mock_workflow]}
+        }
+
+        upload = IndividualDataSourceUpload(source_name='stored.csv', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+
+        service = IndividualImportService(self.admin_user)
+        save_data_source = service._save_data_source
+        saved_chunks = []
+
+        def fail_second_chunk(chunk, chunk_upload):
+            if saved_chunks:
+                raise ValueError('Broken chunk')
+            saved_chunks.append(chunk)
+            save_data_source(chunk, chunk_upload)
+
+        with patch.object(service, '_save_data_source', side_effect=fail_second_chunk):
+            service.import_stored_file(upload.uuid, 'stored.csv', 'text/csv', 'Test Workflow', 'Test Group')
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, IndividualDataSourceUpload.Status.FAIL)
+        # Committed chunk is removed, progress of the failed stage is kept
+        self.assertFalse(IndividualDataSource.objects.filter(upload=upload).exists())
+        self.assertEqual(upload.metrics['ingestion']['rows_processed'], 2)
+        self.assertTrue(upload.metrics['ingestion']['failed'])
+        mock_workflow.run.assert_not_called()
+
+    def test_save_data_source_json_ext_matches_row_serialization(self):
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+
+        dataframe = pd.read_csv(self.csv_file_path)
+        dataframe['number_of_children'] = [index if index % 2 else None for index in range(len(dataframe))]
+        dataframe['registration_date'] = pd.to_datetime('2024-01-01')
+        expected_json_ext = [json.loads(row.to_json()) for _, row in dataframe.iterrows()]
+
+        service = IndividualImportService(self.admin_user)
+        service._save_data_source(dataframe, upload)
+
+        saved_json_ext = [source.json_ext for source in IndividualDataSource.objects.filter(upload=upload)]
+        self.assertCountEqual(saved_json_ext, expected_json_ext)
+
+    @patch('individual.services.IndividualConfig.import_chunk_size', 2)
+    def test_save_data_source_in_chunks_matches_single_read(self):
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+
+        dataframe = pd.read_csv(self.csv_file_path)
+        # Integers in the first chunks and a decimal in the last one
+        dataframe['income'] = [index + 1 for index in range(len(dataframe) - 1)] + [2.5]
+        content = dataframe.to_csv(index=False).encode()
+        expected_json_ext = json.loads(pd.read_csv(io.BytesIO(content)).to_json(orient='records'))
+
+        service = IndividualImportService(self.admin_user)
+        csv_file = SimpleUploadedFile('test.csv', content, content_type="text/csv")
+        with UploadStageMetrics(upload, 'ingestion') as stage_metrics:
+            service._save_data_source_in_chunks(csv_file, upload, stage_metrics)
+
+        saved_json_ext = [source.json_ext for source in IndividualDataSource.objects.filter(upload=upload)]
+        self.assertCountEqual(saved_json_ext, expected_json_ext)
+        self.assertTrue(all(isinstance(json_ext['income'], float) for json_ext in saved_json_ext))
+
+    def test_synchronize_data_for_reporting(self):
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(username=self.admin_user.login_name)
+        individuals = [
+            create_individual(self.admin_user.login_name, {'json_ext': {'educated_level': 'basic'}}),
+            create_individual(self.admin_user.login_name, {'json_ext': None}),
+        ]
+        for individual in individuals:
+            IndividualDataSource(upload=upload, individual=individual).save(username=self.admin_user.login_name)
+
+        service = IndividualImportService(self.admin_user)
+        service.synchronize_data_for_reporting(upload.id)
+
+        first, second = individuals
+        for individual in individuals:
+            individual.refresh_from_db()
+            self.assertEqual(individual.json_ext['report_synch'], 'true')
+            self.assertEqual(individual.json_ext['version'], individual.version)
+            self.assertEqual(individual.history.first().json_ext, individual.json_ext)
+        self.assertEqual(first.json_ext['educated_level'], 'basic')
+        self.assertEqual(set(second.json_ext), {'report_synch', 'version'})
+
     def _create_mock_workflow(self):
         mock_workflow = MagicMock()
         mock_workflow.name = 'Test Workflow'
@@ -184,6 +391,131 @@ class IndividualImportServiceTest(TestCase):
                 self.assertEqual(email_validation.get('note'), "'email' Field value 'john@example.com' is duplicated")
 
 
+    @patch('individual.services.IndividualConfig.individual_schema', json.dumps({
+        "properties": {
+            "email": {"type": "string", "uniqueness": True}
+        }
+    }))
+    @patch('individual.services.IndividualConfig.import_chunk_size', 2)
+    @patch('individual.services.load_dataframe')
+    @patch('individual.services.fetch_summary_of_broken_items')
+    def test_validate_import_individuals_uniqueness_across_chunks(self, mock_fetch_summary, mock_load_dataframe):
+        dataframe = pd.DataFrame({
+            'id': [1, 2, 3],
+            'email': ['john@example.com', 'jane@example.com', 'john@example.com']
+        })
+        mock_load_dataframe.return_value = dataframe
+        mock_fetch_summary.return_value = {"invalid_items_count": 2}
+
+        service = IndividualImportService(self.admin_user)
+        result = service.validate_import_individuals(uuid.uuid4(), MagicMock())
+
+        validated_rows = result['data']
+        self.assertEqual([row['row']['id'] for row in validated_rows], [1, 2, 3])
+        self.assertEqual(
+            [row['validations']['email_uniqueness']['success'] for row in validated_rows],
+            [False, True, False]
+        )
+        self.assertNotIn('note', validated_rows[1]['validations']['email_uniqueness'])
+
+    @patch('individual.services.IndividualConfig.individual_schema', json.dumps({
+        "properties": {
+            "email": {"type": "string", "uniqueness": True}
+        }
+    }))
+    @patch('individual.services.IndividualConfig.import_chunk_size', 2)
+    @patch('individual.services.IndividualConfig.enable_parallel_validation', True)
+    @patch('individual.services.IndividualConfig.validation_worker_count', 2)
+    @patch('individual.services.load_dataframe')
+    @patch('individual.services.fetch_summary_of_broken_items')
+    def test_validate_import_individuals_parallel(self, mock_fetch_summary, mock_load_dataframe):
+        dataframe = pd.DataFrame({
+            'id': [1, 2, 3, 4, 5],
+            'email': ['a@example.com', 'b@example.com', 'a@example.com', 'c@example.com', 'b@example.com']
+        })
+        mock_load_dataframe.return_value = dataframe
+        mock_fetch_summary.return_value = {"invalid_items_count": 4}
+
+        # Worker processes would connect to the non-test database, threads run the same pool code path
+        def thread_pool_executor(max_workers, mp_context, initializer):
+            return ThreadPoolExecutor(max_workers=max_workers)
+
+        service = IndividualImportService(self.admin_user)
+        with patch('individual.services.concurrent.futures.ProcessPoolExecutor', side_effect=thread_pool_executor) \
+                as mock_executor:
+            result = service.validate_import_individuals(uuid.uuid4(), MagicMock())
+        mock_executor.assert_called_once()
+
+        validated_rows = result['data']
+        self.assertEqual([row['row']['id'] for row in validated_rows], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            [row['validations']['email_uniqueness']['success'] for row in validated_rows],
+            [False, False, False, True, False]
+        )
+
+
+    @patch('individual.services.IndividualConfig.individual_schema', json.dumps({
+        "properties": {
+            "national_id_type": {"type": "string", "validationCalculation": {"name": "validate_id_type"}},
+            "national_id": {"type": "string", "validationCalculation": {"name": "validate_id"}},
+        }
+    }))
+    @patch('individual.services.get_calculation_object')
+    @patch('individual.services.load_dataframe')
+    @patch('individual.services.fetch_summary_of_broken_items')
+    def test_validate_import_individuals_calculation_memoized(
+            self, mock_fetch_summary, mock_load_dataframe, mock_get_calculation_object):
+        dataframe = pd.DataFrame({
+            'id': [1, 2, 3, 4],
+            'national_id_type': ['passport', 'passport', 'unknown', 'passport'],
+            'national_id': ['A1', 'A2', 'A3', None],
+        })
+        mock_load_dataframe.return_value = dataframe
+        mock_fetch_summary.return_value = {"invalid_items_count": 1}
+
+        def calculate(validation_name, calculation_uuid, field_name, field_value):
+            success = field_value != 'unknown'
+            return {'success': success, 'field_name': field_name, 'note': None if success else 'Invalid'}
+
+        calculation = mock_get_calculation_object.return_value
+        calculation.calculate_if_active_for_object.side_effect = calculate
+
+        service = IndividualImportService(self.admin_user)
+        result = service.validate_import_individuals(uuid.uuid4(), MagicMock())
+
+        # Calculation is resolved once and evaluated once per distinct value of a column
+        mock_get_calculation_object.assert_called_once()
+        evaluated = [
+            (call.kwargs['field_name'], call.kwargs['field_value'])
+            for call in calculation.calculate_if_active_for_object.call_args_list
+        ]
+        self.assertCountEqual(evaluated, [
+            ('national_id_type', 'passport'), ('national_id_type', 'unknown'),
+            ('national_id', 'A1'), ('national_id', 'A2'), ('national_id', 'A3'), ('national_id', None),
+        ])
+
+        validated_rows = result['data']
+        self.assertEqual(
+            [row['validations']['national_id_type']['success'] for row in validated_rows],
+            [True, True, False, True]
+        )
+        self.assertTrue(all(row['validations']['national_id']['success'] for row in validated_rows))
+
+    def test_validate_calculation_column_memoized_by_type(self):
+        column = pd.Series([1, 1.0, True, 1, None, None], dtype=object)
+        calculation = MagicMock()
+        calculation.calculate_if_active_for_object.side_effect = \
+            lambda validation_name, calculation_uuid, field_name, field_value: {
+                'success': type(field_value) is int, 'field_name': field_name, 'note': None
+            }
+
+        results = IndividualImportService._validate_calculation_column(
+            column, 'number', {"validationCalculation": {"name": "validate_number"}}, calculation)
+
+        self.assertEqual([result['success'] for result in results], [True, False, False, True, False, False])
+        evaluated = [call.kwargs['field_value'] for call in calculation.calculate_if_active_for_object.call_args_list]
+        self.assertEqual([type(value) for value in evaluated], [int, float, bool, type(None)])
+
     @patch('individual.services.load_dataframe')
     @patch('individual.services.fetch_summary_of_broken_items')
     def test_validate_import_individuals_row_level_security(self, mock_fetch_summary, mock_load_dataframe):
@@ -269,6 +601,8 @@ class IndividualImportServiceTest(TestCase):
     @patch('individual.services.fetch_summary_of_broken_items')
     def test_validate_import_individuals_ambiguous_location_name(self, mock_fetch_summary, mock_load_dataframe):
         # set up another location with the same named and code in DB
+        # the village index built with it would outlive the rollback of the test
+        self.addCleanup(invalidate_village_index)
         loc_dup = Location.objects.create(**{
             'name': 'Fairfax',
             'code': '703',
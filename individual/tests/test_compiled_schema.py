@@ -0,0 +1,57 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from individual.apps import IndividualConfig
+from individual.compiled_schema import get_individual_schema, on_module_configuration_change
+
+
+class CompiledIndividualSchemaTest(TestCase):
+    schema = {
+        "properties": {
+            "email": {"type": "string", "uniqueness": True},
+            "national_id_type": {"type": "string", "validationCalculation": {"name": "validate_id_type"}},
+            "able_bodied": {"type": "boolean"},
+        }
+    }
+
+    @patch('individual.compiled_schema.IndividualConfig.individual_schema', json.dumps(schema))
+    def test_compiled_schema(self):
+        compiled = get_individual_schema()
+
+        self.assertEqual(compiled.schema, self.schema)
+        self.assertEqual(compiled.unique_fields, ['email'])
+        self.assertEqual(compiled.calculation_fields, ['national_id_type'])
+        self.assertEqual(
+            compiled.header_whitelist,
+            {'email', 'national_id_type', 'able_bodied', 'recipient_info', 'group_code', 'individual_role'}
+        )
+        # Compiled once for the same source
+        self.assertIs(get_individual_schema(), compiled)
+
+    def test_compiled_schema_rebuilt_on_source_change(self):
+        with patch('individual.compiled_schema.IndividualConfig.individual_schema', json.dumps(self.schema)):
+            compiled = get_individual_schema()
+        with patch('individual.compiled_schema.IndividualConfig.individual_schema', '{}'):
+            self.assertIsNot(get_individual_schema(), compiled)
+            self.assertEqual(get_individual_schema().properties, {})
+
+    @patch('individual.compiled_schema.IndividualConfig.individual_schema', '{}')
+    def test_module_configuration_change(self):
+        configuration = MagicMock(
+            module='individual', layer='be', config=json.dumps({"individual_schema": json.dumps(self.schema)})
+        )
+        on_module_configuration_change(sender=None, instance=configuration)
+
+        self.assertEqual(IndividualConfig.individual_schema, json.dumps(self.schema))
+        self.assertEqual(get_individual_schema().unique_fields, ['email'])
+
+    @patch('individual.compiled_schema.IndividualConfig.individual_schema', '{}')
+    def test_module_configuration_change_other_module(self):
+        configuration = MagicMock(
+            module='social_protection', layer='be', config=json.dumps({"individual_schema": json.dumps(self.schema)})
+        )
+        on_module_configuration_change(sender=None, instance=configuration)
+
+        self.assertEqual(IndividualConfig.individual_schema, '{}')
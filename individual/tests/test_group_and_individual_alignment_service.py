@@ -1,11 +1,14 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 
 from core.test_helpers import LogInHelper
 from individual.models import Individual, GroupIndividual, Group
-from individual.services import GroupAndGroupIndividualAlignmentService
+from individual.services import GroupAndGroupIndividualAlignmentService, deferred_group_alignment
 from individual.tests.test_helpers import (
     create_individual,
     create_group,
+    add_individual_to_group,
 )
 from location.test_helpers import create_test_village
 
@@ -100,3 +103,105 @@ class GroupAndGroupIndividualAlignmentServiceTest(TestCase):
         self.assert_group_and_individual_location_equal(
             self.group.id, self.individual.id, self.loc_b.id
         )
+
+    def test_update_json_ext_for_member(self):
+        head = create_individual(self.username, {'first_name': 'Head', 'json_ext': {'household_size': 3}})
+        members = [create_individual(self.username, {'first_name': f'Member{i}'}) for i in range(2)]
+        add_individual_to_group(self.username, head, self.group)
+        for member in members:
+            add_individual_to_group(self.username, member, self.group, is_head=False)
+
+        self.group.refresh_from_db()
+        json_ext = self.group.json_ext
+        self.assertEqual(set(json_ext['members']), {str(head.id)} | {str(member.id) for member in members})
+        self.assertEqual(json_ext['head_id'], str(head.id))
+        self.assertEqual(json_ext['primary_recipient_id'], str(head.id))
+        self.assertEqual(json_ext['household_size'], 3)
+
+        # Same result as the full recompute
+        self.service.update_json_ext_for_group(self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.json_ext, json_ext)
+
+    def test_update_json_ext_for_member_head_change(self):
+        old_head = create_individual(self.username, {'first_name': 'OldHead'})
+        add_individual_to_group(self.username, old_head, self.group)
+        add_individual_to_group(self.username, self.individual, self.group)
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.json_ext['head_id'], str(self.individual.id))
+        self.assertEqual(self.group.json_ext['head'], f'{self.individual.first_name} {self.individual.last_name}')
+
+        GroupIndividual.objects.get(group=self.group, individual=self.individual).delete(user=self.user)
+        self.group.refresh_from_db()
+        self.assertNotIn(str(self.individual.id), self.group.json_ext['members'])
+        self.assertIsNone(self.group.json_ext['head_id'])
+
+    @patch.object(GroupAndGroupIndividualAlignmentService, 'update_json_ext_for_member')
+    def test_deferred_group_alignment(self, mock_update_json_ext_for_member):
+        self.group.location = self.loc_a
+        self.group.save(user=self.user)
+        members = [create_individual(self.username, {'location': self.loc_b}) for _ in range(3)]
+        with deferred_group_alignment(self.user):
+            for member in members:
+                add_individual_to_group(self.username, member, self.group)
+            self.group.refresh_from_db()
+            self.assertNotIn('members', self.group.json_ext)
+
+        mock_update_json_ext_for_member.assert_not_called()
+        group_individuals = GroupIndividual.objects.filter(group=self.group, is_deleted=False)
+        # The last added head keeps the role
+        head = group_individuals.get(role=GroupIndividual.Role.HEAD)
+        self.assertEqual(head.individual_id, members[-1].id)
+        self.assertEqual(group_individuals.filter(recipient_type=GroupIndividual.RecipientType.PRIMARY).count(), 1)
+
+        self.group.refresh_from_db()
+        self.assertEqual(set(self.group.json_ext['members']), {str(member.id) for member in members})
+        self.assertEqual(self.group.json_ext['head_id'], str(members[-1].id))
+        for member in members:
+            member.refresh_from_db()
+            self.assertEqual(member.location_id, self.loc_a.id)
+
+    def test_deferred_group_alignment_delete_keeps_locations(self):
+        head = create_individual(self.username)
+        member = create_individual(self.username)
+        removed = create_individual(self.username)
+        for individual, is_head in ((head, True), (member, False), (removed, False)):
+            add_individual_to_group(self.username, individual, self.group, is_head=is_head)
+        # Group without location, members located without going through the save hooks
+        Individual.objects.filter(id=member.id).update(location=self.loc_a)
+
+        with deferred_group_alignment(self.user):
+            GroupIndividual.objects.get(group=self.group, individual=removed).delete(user=self.user)
+
+        member.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(member.location_id, self.loc_a.id)
+        self.assertIsNone(self.group.location_id)
+
+    def test_deferred_group_alignment_delete_keeps_roles(self):
+        head = create_individual(self.username)
+        primary = create_individual(self.username)
+        member = create_individual(self.username)
+        add_individual_to_group(self.username, head, self.group)
+        primary_group_individual = add_individual_to_group(self.username, primary, self.group, is_head=False)
+        primary_group_individual.recipient_type = GroupIndividual.RecipientType.PRIMARY
+        primary_group_individual.save(username=self.username)
+        add_individual_to_group(self.username, member, self.group, is_head=False)
+        roles = {
+            gi.individual_id: (gi.role, gi.recipient_type)
+            for gi in GroupIndividual.objects.filter(group=self.group, is_deleted=False).exclude(individual=primary)
+        }
+
+        with deferred_group_alignment(self.user):
+            GroupIndividual.objects.get(group=self.group, individual=primary).delete(user=self.user)
+
+        # No member is promoted to the primary recipient in place of the deleted one
+        self.assertEqual(roles, {
+            gi.individual_id: (gi.role, gi.recipient_type)
+            for gi in GroupIndividual.objects.filter(group=self.group, is_deleted=False)
+        })
+        self.group.refresh_from_db()
+        self.assertNotIn(str(primary.id), self.group.json_ext['members'])
+        self.assertIsNone(self.group.json_ext['primary_recipient_id'])
+        self.assertEqual(self.group.json_ext['head_id'], str(head.id))
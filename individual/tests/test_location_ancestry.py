@@ -0,0 +1,75 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from individual.models import Individual
+from individual.schema import Query
+from individual.tests.test_helpers import create_individual, create_test_interactive_user
+from location.models import Location
+from location.test_helpers import create_test_village
+
+
+class LocationAncestryTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = create_test_interactive_user(username="locationAncestryAdmin")
+        cls.village = create_test_village({
+            'name': 'Ancestry Village',
+            'code': 'AnV',
+        })
+        cls.ward = cls.village.parent
+        cls.district = cls.ward.parent
+        cls.region = cls.district.parent
+        cls.individual = create_individual(cls.admin_user.username, {'location': cls.village})
+
+    def assert_ancestry(self, individual, ward, district, region):
+        individual.refresh_from_db()
+        self.assertEqual(individual.location_ward_id, ward.id)
+        self.assertEqual(individual.location_district_id, district.id)
+        self.assertEqual(individual.location_region_id, region.id)
+
+    def test_ancestry_set_on_save(self):
+        self.assert_ancestry(self.individual, self.ward, self.district, self.region)
+
+        self.individual.location = None
+        self.individual.save(username=self.admin_user.username)
+        self.individual.refresh_from_db()
+        self.assertIsNone(self.individual.location_ward_id)
+        self.assertIsNone(self.individual.location_district_id)
+        self.assertIsNone(self.individual.location_region_id)
+
+    def test_ancestry_refreshed_on_location_move(self):
+        other_district = Location.objects.create(
+            name='Other District', code='AnOD', type='D', parent=self.region, validity_from='2019-06-01'
+        )
+        self.ward.parent = other_district
+        self.ward.save()
+
+        self.assert_ancestry(self.individual, self.ward, other_district, self.region)
+
+    def test_parent_location_filter(self):
+        other_individual = create_individual(self.admin_user.username)
+        for level, location in enumerate((self.region, self.district, self.ward, self.village)):
+            location_filter = Query._get_location_filters(location.uuid, level)
+            with patch('individual.location_ancestry.IndividualConfig.enable_location_ancestry_filter', True):
+                ancestry_filter = Query._get_location_filters(location.uuid, level)
+
+            self.assertNotEqual(ancestry_filter, location_filter)
+            self.assertEqual(
+                list(Individual.objects.filter(ancestry_filter).values_list('id', flat=True)),
+                list(Individual.objects.filter(location_filter).values_list('id', flat=True)),
+            )
+            # Chained, the manager takes filter(q, id=...) for a cached id lookup and ignores q
+            self.assertFalse(Individual.objects.filter(ancestry_filter).filter(id=other_individual.id).exists())
+
+    def test_backfill_location_ancestry(self):
+        Individual.objects.filter(id=self.individual.id).update(
+            location_ward=None, location_district=None, location_region=None
+        )
+
+        call_command('backfill_location_ancestry', batch_size=1, stdout=StringIO())
+
+        self.assert_ancestry(self.individual, self.ward, self.district, self.region)
@@ -0,0 +1,104 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from core.models import User
+from individual.location_cache import (
+    get_village_index,
+    get_allowed_location_ids,
+    build_user_location_filter_query,
+    invalidate_allowed_locations,
+    cache,
+    VILLAGE_INDEX_VERSION_CACHE_KEY,
+)
+from individual.tests.test_helpers import create_sp_role, create_test_interactive_user
+from location.models import Location, LocationManager, extend_allowed_locations
+from location.test_helpers import create_test_village, assign_user_districts
+
+
+class LocationCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.village = create_test_village({
+            'name': 'Index Village',
+            'code': 'IxV',
+        })
+        admin_user = create_test_interactive_user(username="locationCacheAdmin")
+        cls.district_user = create_test_interactive_user(
+            username="locationCacheDistrictUser", roles=[create_sp_role(admin_user).id]
+        )
+        assign_user_districts(cls.district_user, [cls.village.parent.parent.code])
+
+    def test_village_index(self):
+        index = get_village_index()
+
+        village_location = index[('Index Village', 'IxV')]
+        self.assertEqual(village_location.location_id, self.village.id)
+        self.assertEqual(village_location.district_id, self.village.parent.parent_id)
+        self.assertFalse(village_location.ambiguous)
+        # Index is reused until locations change
+        self.assertIs(get_village_index(), index)
+
+    def test_village_index_rebuilt_on_location_change(self):
+        get_village_index()
+        Location.objects.create(name='Index Village', code='IxV', type='V', parent=self.village.parent)
+
+        village_location = get_village_index()[('Index Village', 'IxV')]
+        self.assertTrue(village_location.ambiguous)
+        self.assertIsNone(village_location.location_id)
+
+    def test_village_index_follows_rename(self):
+        get_village_index()
+        self.village.name = 'Renamed Index Village'
+        self.village.save()
+
+        index = get_village_index()
+        self.assertNotIn(('Index Village', 'IxV'), index)
+        self.assertEqual(index[('Renamed Index Village', 'IxV')].location_id, self.village.id)
+
+    def test_village_index_version_bumped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.village.save()
+            version = cache.get(VILLAGE_INDEX_VERSION_CACHE_KEY)
+
+        self.assertNotEqual(cache.get(VILLAGE_INDEX_VERSION_CACHE_KEY), version)
+
+    def test_allowed_location_ids(self):
+        expected = set(extend_allowed_locations(
+            LocationManager().get_allowed_ids(self.district_user), True, ["R", "D", "W", "V"]
+        ))
+
+        self.assertEqual(set(get_allowed_location_ids(self.district_user)), expected)
+        self.assertIn(self.village.id, expected)
+        self.assertEqual(
+            set(Location.objects.filter(build_user_location_filter_query(self.district_user._u, prefix='id'))),
+            set(Location.objects.filter(
+                LocationManager().build_user_location_filter_query(self.district_user._u, prefix='id')
+            ))
+        )
+
+    def test_allowed_location_ids_cached(self):
+        invalidate_allowed_locations()
+        with patch('individual.location_cache.extend_allowed_locations', wraps=extend_allowed_locations) as mock_extend, \
+                patch.object(LocationManager, 'get_allowed_ids', wraps=LocationManager().get_allowed_ids) as mock_ids:
+            get_allowed_location_ids(User.objects.get(id=self.district_user.id))
+            get_allowed_location_ids(User.objects.get(id=self.district_user.id))
+            self.assertEqual(mock_extend.call_count, 1)
+            # Shared entry is found without resolving the assigned locations again
+            self.assertEqual(mock_ids.call_count, 1)
+
+            invalidate_allowed_locations()
+            get_allowed_location_ids(User.objects.get(id=self.district_user.id))
+            self.assertEqual(mock_extend.call_count, 2)
+
+    def test_allowed_location_ids_of_long_lived_user(self):
+        user = User.objects.get(id=self.district_user.id)
+        allowed = get_allowed_location_ids(user)
+        self.assertIs(get_allowed_location_ids(user), allowed)
+
+        other_district = Location.objects.filter(type='D').exclude(id=self.village.parent.parent_id).first()
+        assign_user_districts(self.district_user, [self.village.parent.parent.code, other_district.code])
+
+        # Copy kept on the user instance is dropped once locations or user districts change
+        self.assertIn(other_district.id, get_allowed_location_ids(user))
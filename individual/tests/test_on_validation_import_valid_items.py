@@ -0,0 +1,129 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+
+from core.test_helpers import create_test_interactive_user
+from individual.models import (
+    Group,
+    GroupDataSource,
+    GroupIndividual,
+    IndividualDataSource,
+    IndividualDataSourceUpload,
+    IndividualDataUploadRecords,
+)
+from individual.signals.on_validation_import_valid_items import BaseGroupColumnAggregationClass
+from individual.tests.data import service_add_individual_payload
+from individual.tests.test_helpers import add_individual_to_group, create_group, create_individual
+
+
+class BaseGroupColumnAggregationClassTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_test_interactive_user(username="groupAggregationAdmin")
+        cls.upload = IndividualDataSourceUpload(source_name='csv', source_type='upload')
+        cls.upload.save(user=cls.user)
+
+        cls.head = create_individual(cls.user.username, {
+            'json_ext': {'group_code': 'HH1', 'recipient_info': 1, 'individual_role': 'HEAD'}
+        })
+        cls.member = create_individual(cls.user.username, {
+            'json_ext': {'group_code': 'HH1', 'recipient_info': '2', 'individual_role': 'son'}
+        })
+        for individual in (cls.head, cls.member):
+            IndividualDataSource(
+                upload=cls.upload, individual=individual, json_ext=individual.json_ext
+            ).save(user=cls.user)
+
+    def setUp(self):
+        self.event = BaseGroupColumnAggregationClass('group.workflow', None, self.upload.id, self.user)
+        self.event.set_group_aggregation_column(None)
+        self.event.individuals = self.event._query_individuals()
+
+    def test_build_individual_data(self):
+        ids = [str(self.head.id), str(self.member.id)]
+
+        # Members of the upload are read with a single query
+        with self.assertNumQueries(1):
+            individuals_data = self.event._build_individual_data(ids)
+        with self.assertNumQueries(0):
+            self.event._build_individual_data(ids[1:])
+
+        self.assertEqual(individuals_data, [
+            {
+                'individual_id': ids[0],
+                'recipient_type': GroupIndividual.RecipientType.PRIMARY,
+                'role': GroupIndividual.Role.HEAD
+            },
+            {
+                'individual_id': ids[1],
+                'recipient_type': GroupIndividual.RecipientType.SECONDARY,
+                'role': GroupIndividual.Role.SON
+            },
+        ])
+
+    def test_build_individual_data_outside_of_upload(self):
+        other = create_individual(self.user.username, {'json_ext': {'recipient_info': 0, 'individual_role': 'WIFE'}})
+
+        individuals_data = self.event._build_individual_data([str(self.head.id), str(other.id)])
+
+        self.assertEqual(individuals_data[1], {'individual_id': str(other.id), 'recipient_type': None, 'role': None})
+
+    def test_create_or_update_groups_using_group_code(self):
+        existing_group = create_group(self.user.username, {'code': 'HH1'})
+        existing_member = create_individual(self.user.username, {'json_ext': {'individual_role': 'DAUGHTER'}})
+        add_individual_to_group(self.user.username, existing_member, existing_group, is_head=False)
+        upload_record = IndividualDataUploadRecords(data_upload=self.upload, workflow='workflow')
+        upload_record.save(user=self.user)
+        self.event.upload_record = upload_record
+        self.event.grouped_individuals = self.event._get_grouped_individuals()
+
+        with self.assertNumQueries(2):
+            groups_by_code, assigned_individual_ids = self.event._get_existing_groups(['HH1', 'HH2'])
+        self.assertEqual(groups_by_code, {'HH1': existing_group})
+        self.assertEqual(assigned_individual_ids[existing_group.id], [str(existing_member.id)])
+
+        self.event._create_or_update_groups_using_group_code()
+
+        data_source = GroupDataSource.objects.get(upload=self.upload)
+        self.assertEqual(data_source.json_ext['id'], str(existing_group.id))
+        self.assertEqual(
+            {data['individual_id'] for data in data_source.json_ext['individuals_data']},
+            {str(self.head.id), str(self.member.id), str(existing_member.id)}
+        )
+
+    def test_generate_unique_codes(self):
+        create_group(self.user.username, {'code': 'TAKEN001'})
+        candidates = [['TAKEN001', 'FREE0001', 'FREE0001'], ['FREE0002']]
+
+        with patch.object(BaseGroupColumnAggregationClass, '_code_candidates', side_effect=candidates), \
+                self.assertNumQueries(2):
+            codes = BaseGroupColumnAggregationClass.generate_unique_codes(2)
+
+        self.assertEqual(codes, ['FREE0001', 'FREE0002'])
+
+    @patch('individual.apps.IndividualConfig.group_code_sequence', True)
+    def test_generate_unique_codes_from_sequence(self):
+        codes = BaseGroupColumnAggregationClass.generate_unique_codes(3)
+
+        self.assertEqual(len(set(codes)), 3)
+        self.assertFalse(Group.objects.filter(code__in=codes).exists())
+        if connection.vendor == 'postgresql':
+            self.assertTrue(all(code.isdigit() and len(code) == 8 for code in codes))
+
+    def test_clean_json_ext(self):
+        other = create_individual(self.user.username, {'json_ext': {'group_code': 'HH1', 'educated_level': 'basic'}})
+        IndividualDataSource(upload=self.upload, individual=other, json_ext=other.json_ext).save(user=self.user)
+        version = other.version
+
+        self.event._clean_json_ext()
+
+        for individual in (self.head, self.member):
+            individual.refresh_from_db()
+            self.assertEqual(individual.json_ext, service_add_individual_payload['json_ext'])
+        other.refresh_from_db()
+        expected_json_ext = {**service_add_individual_payload['json_ext'], 'educated_level': 'basic'}
+        self.assertEqual(other.json_ext, expected_json_ext)
+        self.assertEqual(other.version, version + 1)
+        self.assertEqual(other.history.first().json_ext, expected_json_ext)
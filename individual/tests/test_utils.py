@@ -1,7 +1,16 @@
+import uuid
+from unittest.mock import patch
+
+from django.db import connection
 from django.test import TestCase
-from individual.models import IndividualDataSource
-from individual.utils import load_dataframe
+from core.test_helpers import create_test_interactive_user
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.utils import load_dataframe, bulk_insert_instances, bulk_update_field, UploadStageMetrics, \
+    _copy_from_buffer, read_csv_in_chunks, read_workbook_in_chunks
+from openpyxl import Workbook
+from openpyxl.styles import Font
 import pandas as pd
+import io
 import json
 
 class UtilsTest(TestCase):
@@ -42,3 +51,158 @@ class UtilsTest(TestCase):
         self.assertEqual(df.at[0, "name"], 'Alice')
         self.assertEqual(df.at[1, "name"], '')
         self.assertIsNone(df.at[2, "name"])
+
+    def test_read_csv_in_chunks_matches_single_read(self):
+        # Column a switches between int and float across chunks of 2 rows
+        content = b"a,b\n1,x\n2,y\n3.5,\n4,z\n"
+        expected = json.loads(pd.read_csv(io.BytesIO(content)).to_json(orient='records'))
+
+        chunks = list(read_csv_in_chunks(io.BytesIO(content), 2))
+
+        self.assertEqual(len(chunks), 2)
+        records = [record for chunk in chunks for record in json.loads(chunk.to_json(orient='records'))]
+        self.assertEqual(records, expected)
+        self.assertEqual([record['a'] for record in records], [1.0, 2.0, 3.5, 4.0])
+
+    def test_read_workbook_in_chunks_matches_single_read(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['first_name', 'last_name', 'dob'])
+        sheet.append(['Alice', 'Smith', '1990-01-01'])
+        sheet.append([None, None, None])
+        sheet.append(['Bob', 'Brown', '1991-02-03'])
+        # Formatted but empty trailing cells
+        sheet['E1'].font = Font(bold=True)
+        sheet['E2'].font = Font(bold=True)
+        content = io.BytesIO()
+        workbook.save(content)
+        expected = pd.read_excel(io.BytesIO(content.getvalue()))
+
+        chunks = list(read_workbook_in_chunks(io.BytesIO(content.getvalue()), 2))
+
+        self.assertEqual([list(chunk.columns) for chunk in chunks], [['first_name', 'last_name', 'dob']] * 2)
+        records = [record for chunk in chunks for record in json.loads(chunk.to_json(orient='records'))]
+        self.assertEqual(records, json.loads(expected.to_json(orient='records')))
+
+    def test_bulk_insert_instances(self):
+        user = create_test_interactive_user(username="admin")
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(user=user)
+
+        json_exts = [
+            {"name": "Alice", "note": "comma, \"quote\"\nand newline"},
+            {"name": "", "age": None},
+            {"name": "\\N"},
+        ]
+        sources = [
+            IndividualDataSource(
+                upload=upload,
+                json_ext=json_ext,
+                validations={},
+                user_created=user,
+                user_updated=user,
+                uuid=uuid.uuid4()
+            )
+            for json_ext in json_exts
+        ]
+        with patch('individual.utils._copy_from_buffer', wraps=_copy_from_buffer) as mock_copy:
+            bulk_insert_instances(IndividualDataSource, sources, batch_size=2)
+        if connection.vendor == 'postgresql':
+            # One COPY per batch
+            self.assertEqual(mock_copy.call_count, 2)
+
+        saved = IndividualDataSource.objects.filter(upload=upload)
+        self.assertEqual(saved.count(), 3)
+        self.assertCountEqual([source.json_ext for source in saved], json_exts)
+        for source in saved:
+            self.assertEqual(source.validations, {})
+            self.assertFalse(source.is_deleted)
+            self.assertEqual(source.user_created_id, user.id)
+
+    def test_bulk_insert_instances_null_marker_text(self):
+        user = create_test_interactive_user(username="admin")
+        upload = IndividualDataSourceUpload(
+            source_name='\\N', source_type='individual import', user_created=user, user_updated=user, uuid=uuid.uuid4()
+        )
+        bulk_insert_instances(IndividualDataSourceUpload, [upload])
+
+        # Text equal to the COPY NULL marker is kept
+        self.assertEqual(IndividualDataSourceUpload.objects.get(id=upload.id).source_name, '\\N')
+
+    def test_bulk_update_field(self):
+        user = create_test_interactive_user(username="admin")
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(user=user)
+        sources = [
+            IndividualDataSource(
+                upload=upload,
+                json_ext={"name": name},
+                validations={'validation_errors': []},
+                user_created=user,
+                user_updated=user,
+                uuid=uuid.uuid4()
+            )
+            for name in ["Alice", "Bob", "Carol"]
+        ]
+        bulk_insert_instances(IndividualDataSource, sources)
+
+        errors = {'validation_errors': [{'field_name': 'name', 'note': 'comma, "quote"'}]}
+        updated = bulk_update_field(IndividualDataSource, 'validations', [
+            (str(sources[0].id), {'validation_errors': []}),
+            (str(sources[1].id), errors),
+        ])
+
+        # Unchanged row is skipped, row missing in the input is kept
+        self.assertEqual(updated, 1)
+        saved = {source.id: source.validations for source in IndividualDataSource.objects.filter(upload=upload)}
+        self.assertEqual(saved[sources[0].id], {'validation_errors': []})
+        self.assertEqual(saved[sources[1].id], errors)
+        self.assertEqual(saved[sources[2].id], {'validation_errors': []})
+        self.assertEqual(bulk_update_field(IndividualDataSource, 'validations', [(sources[1].id, errors)]), 0)
+
+    def test_upload_stage_metrics(self):
+        user = create_test_interactive_user(username="admin")
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(user=user)
+
+        with UploadStageMetrics(upload, 'ingestion', rows_total=3) as stage_metrics:
+            stage_metrics.advance(2)
+            running = IndividualDataSourceUpload.objects.get(id=upload.id).metrics['ingestion']
+            self.assertEqual(running['rows_processed'], 2)
+            self.assertIsNone(running['finished_at'])
+            stage_metrics.advance(1)
+        with UploadStageMetrics(upload.id, 'validation', rows_total=3) as stage_metrics:
+            stage_metrics.advance(3)
+
+        metrics = IndividualDataSourceUpload.objects.get(id=upload.id).metrics
+        self.assertEqual(set(metrics), {'ingestion', 'validation'})
+        self.assertEqual(metrics['ingestion']['rows_total'], 3)
+        self.assertEqual(metrics['ingestion']['rows_processed'], 3)
+        self.assertIsNotNone(metrics['ingestion']['finished_at'])
+        self.assertGreaterEqual(metrics['ingestion']['wall_time'], 0)
+        self.assertEqual(metrics['validation']['rows_processed'], 3)
+        # Instance passed to the tracker is kept in sync with the database
+        self.assertEqual(upload.metrics['ingestion'], metrics['ingestion'])
+
+    def test_upload_stage_metrics_failed(self):
+        user = create_test_interactive_user(username="admin")
+        upload = IndividualDataSourceUpload(source_name='test.csv', source_type='individual import')
+        upload.save(user=user)
+
+        with UploadStageMetrics(upload.id, 'ingestion', rows_total=3) as stage_metrics:
+            stage_metrics.advance(3)
+        with self.assertRaises(ValueError), UploadStageMetrics(upload.id, 'validation', rows_total=3) as stage_metrics:
+            stage_metrics.advance(1)
+            raise ValueError('Validation error')
+
+        with UploadStageMetrics(upload.id, 'workflow', rows_total=3) as stage_metrics:
+            stage_metrics.failed = True
+
+        metrics = IndividualDataSourceUpload.objects.get(id=upload.id).metrics
+        self.assertTrue(metrics['workflow']['failed'])
+        self.assertIsNone(metrics['workflow']['finished_at'])
+        self.assertFalse(metrics['ingestion']['failed'])
+        self.assertIsNotNone(metrics['ingestion']['finished_at'])
+        self.assertTrue(metrics['validation']['failed'])
+        self.assertIsNone(metrics['validation']['finished_at'])
+        self.assertEqual(metrics['validation']['rows_processed'], 1)
@@ -36,7 +36,7 @@ class TestView(APITestCase):
             f'Expect csv template header to contain {expected_base_csv_header}, but got {content}'
         )
 
-    @patch('individual.views.WorkflowService')
+    @patch('individual.services.WorkflowService')
     @patch('individual.views.IndividualImportService')
     @patch('individual.views.DefaultStorageFileHandler')
     def test_import_individuals_success(
@@ -78,7 +78,7 @@ class TestView(APITestCase):
 
         mock_handler_instance.save_file.assert_called_once()
 
-    @patch('individual.views.WorkflowService')
+    @patch('individual.services.WorkflowService')
     @patch('individual.views.IndividualImportService')
     @patch('individual.views.DefaultStorageFileHandler')
     def test_import_individuals_import_service_failure(
@@ -121,7 +121,7 @@ class TestView(APITestCase):
         mock_handler_instance.remove_file.assert_called_once()
 
 
-    @patch('individual.views.WorkflowService')
+    @patch('individual.services.WorkflowService')
     @patch('individual.views.DefaultStorageFileHandler')
     def test_import_individuals_workflow_service_failure(
             self, mock_file_handler, mock_workflow_service):
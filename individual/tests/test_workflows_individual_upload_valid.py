@@ -0,0 +1,115 @@
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+
+from core.test_helpers import create_test_interactive_user
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.tests.test_helpers import create_test_village
+from individual.workflows.individual_upload_valid import process_import_valid_individuals_workflow
+from individual.workflows.utils import IMPORT_CHECKPOINT_KEY, SqlProcedurePythonWorkflow
+
+
+@skipIf(
+    connection.vendor != "postgresql",
+    "Skipping tests due to implementation usage of validate_json_schema, which is a postgres specific extension."
+)
+@patch('individual.apps.IndividualConfig.import_workflow_chunk_size', 2)
+class ProcessImportValidIndividualsInChunksWorkflowTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Patch validate_dataframe_headers as it is already tested separately
+        cls.validate_headers_patcher = patch(
+            "individual.workflows.utils.BasePythonWorkflowExecutor.validate_dataframe_headers",
+            lambda self: None
+        )
+        cls.validate_headers_patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.validate_headers_patcher.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = create_test_interactive_user(username="admin")
+        self.upload = IndividualDataSourceUpload(source_name='csv', source_type='upload', status="PENDING")
+        self.upload.save(user=self.user)
+
+        self.village = create_test_village({
+            'name': 'Chunked Village',
+            'code': 'ChV',
+        })
+        for index in range(3):
+            IndividualDataSource(
+                upload=self.upload,
+                json_ext={
+                    "first_name": f"John {index}",
+                    "last_name": "Doe",
+                    "dob": "1980-01-01",
+                    "location_name": self.village.name,
+                    "location_code": self.village.code,
+                },
+                validations={'validation_errors': []},
+            ).save(user=self.user)
+
+    def assert_imported(self):
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, "SUCCESS", self.upload.error)
+        self.assertEqual(self.upload.error, {})
+        self.assertNotIn(IMPORT_CHECKPOINT_KEY, self.upload.json_ext or {})
+
+        data_sources = IndividualDataSource.objects.filter(upload=self.upload).select_related('individual')
+        self.assertEqual(len({source.individual_id for source in data_sources if source.individual_id}), 3)
+        for source in data_sources:
+            self.assertEqual(source.individual.first_name, source.json_ext['first_name'])
+            self.assertEqual(source.individual.location_id, self.village.id)
+            self.assertEqual(source.individual.location_ward_id, self.village.parent_id)
+
+    def test_import_in_chunks(self):
+        process_import_valid_individuals_workflow(self.user.id, self.upload.id)
+
+        self.assert_imported()
+        self.assertEqual(self.upload.metrics['workflow']['rows_processed'], 3)
+
+    def test_import_in_chunks_resumed(self):
+        execute_chunk = SqlProcedurePythonWorkflow._execute_chunk
+        calls = []
+
+        def fail_second_chunk(executor, *args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise DatabaseError('connection lost')
+            return execute_chunk(executor, *args)
+
+        with patch.object(SqlProcedurePythonWorkflow, '_execute_chunk', fail_second_chunk):
+            process_import_valid_individuals_workflow(self.user.id, self.upload.id)
+
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, "FAIL")
+        self.assertEqual(self.upload.error['error'], 'connection lost')
+        self.assertEqual(self.upload.json_ext[IMPORT_CHECKPOINT_KEY]['rows_imported'], 2)
+        # The first chunk is kept
+        self.assertEqual(
+            IndividualDataSource.objects.filter(upload=self.upload, individual__isnull=False).count(), 2
+        )
+
+        process_import_valid_individuals_workflow(self.user.id, self.upload.id)
+
+        self.assert_imported()
+
+    def test_import_in_chunks_validation_failure(self):
+        IndividualDataSource(
+            upload=self.upload,
+            json_ext={"last_name": "Doe", "dob": "1980-01-01"},
+            validations={'validation_errors': []},
+        ).save(user=self.user)
+
+        process_import_valid_individuals_workflow(self.user.id, self.upload.id)
+
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, "FAIL")
+        self.assertTrue(self.upload.metrics['workflow']['failed'])
+        self.assertIsNone(self.upload.metrics['workflow']['finished_at'])
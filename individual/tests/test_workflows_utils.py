@@ -1,7 +1,8 @@
 from django.test import TestCase
 from unittest.mock import patch, MagicMock
 from core.test_helpers import create_test_interactive_user
-from individual.workflows.utils import SqlProcedurePythonWorkflow, PythonWorkflowHandlerException
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+from individual.workflows.utils import DataUploadWorkflow, SqlProcedurePythonWorkflow, PythonWorkflowHandlerException
 import pandas as pd
 import json
 import uuid
@@ -74,3 +75,36 @@ class TestBasePythonWorkflowExecutor(TestCase):
         except PythonWorkflowHandlerException:
             self.fail("validate_dataframe_headers() raised PythonWorkflowHandlerException unexpectedly!")
 
+    def test_validate_headers_of_data_sources(self):
+        upload = IndividualDataSourceUpload(source_name='csv', source_type='upload')
+        upload.save(user=self.user)
+        for json_ext in (
+            {'first_name': 'John', 'last_name': 'Doe', 'dob': '1990-01-01', 'location_name': 'Village',
+             'location_code': 'V1', 'Unnamed: 0': 0},
+            {'first_name': 'Jane', 'last_name': 'Doe', 'dob': '1990-01-01', 'location_name': 'Village',
+             'location_code': 'V1', 'email': 'jane@example.com'},
+        ):
+            IndividualDataSource(upload=upload, json_ext=json_ext).save(user=self.user)
+
+        executor = SqlProcedurePythonWorkflow(upload.id, self.user.id)
+        executor.validate_dataframe_headers()
+
+        self.assertEqual(
+            executor.headers,
+            {'first_name', 'last_name', 'dob', 'location_name', 'location_code', 'email', 'id'}
+        )
+        # Headers are read from the database, data sources are not loaded into a DataFrame
+        self.mock_load_dataframe.assert_not_called()
+
+    def test_should_create_task_validates_upload_once(self):
+        import_service = MagicMock()
+        import_service.return_value.validate_import_individuals.return_value = {'summary_invalid_items': []}
+        executor = DataUploadWorkflow(self.upload_id, self.user.id, import_service=import_service)
+
+        self.assertTrue(executor.should_create_task)
+        self.assertTrue(executor.should_create_task)
+
+        import_service.return_value.validate_import_individuals.assert_called_once()
+        _, kwargs = import_service.return_value.validate_import_individuals.call_args
+        self.assertIs(kwargs['dataframe'], executor.df)
+        self.mock_load_dataframe.assert_called_once()
@@ -1,10 +1,21 @@
-from typing import Iterable
+import io
+import json
+import time
+import uuid
+from typing import Any, Iterable, Iterator, List, Set, Tuple
 
+import numpy as np
 import pandas as pd
+from pandas.io.parsers import TextParser
 
+from django.db import connection, models, transaction
 from django.db.models import Q, Value, Func, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from individual.models import IndividualDataSource
+from individual.models import IndividualDataSource, IndividualDataSourceUpload
+
+_COPY_NULL = '\\N'
 
 
 def load_dataframe(individual_sources: Iterable[IndividualDataSource]) -> pd.DataFrame:
@@ -17,6 +28,354 @@ def load_dataframe(individual_sources: Iterable[IndividualDataSource]) -> pd.Dat
     return recreated_df
 
 
+def read_csv_in_chunks(import_file, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads the file twice, the first pass only collects dtypes of every chunk, so columns are typed in all chunks
+    the same way as by a single pd.read_csv.
+    """
+    chunk_dtypes = _ChunkDtypes()
+    import_file.seek(0)
+    for chunk in pd.read_csv(import_file, chunksize=chunk_size):
+        chunk_dtypes.add(chunk)
+
+    import_file.seek(0)
+    yield from pd.read_csv(import_file, chunksize=chunk_size, dtype=chunk_dtypes.common())
+
+
+def read_workbook_in_chunks(import_file, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Streams the first sheet of a workbook opened in read-only mode, so at most chunk_size rows are kept in memory.
+    Cells and rows are converted the same way as by pd.read_excel, the sheet is read twice as the width and dtypes
+    of the whole sheet have to be known before the first chunk is yielded.
+    """
+    chunk_dtypes = _ChunkDtypes()
+    for chunk in _read_workbook_rows_in_chunks(import_file, chunk_size):
+        chunk_dtypes.add(chunk)
+
+    yield from _read_workbook_rows_in_chunks(import_file, chunk_size, chunk_dtypes.width, chunk_dtypes.common())
+
+
+def split_dataframe(dataframe: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(dataframe), chunk_size):
+        yield dataframe.iloc[start:start + chunk_size]
+
+
+class _ChunkDtypes:
+    """
+    Collects kinds of values of every column of a file read in chunks. Parsers infer dtypes separately for each
+    chunk, e.g. integers of one chunk are read as float64 at once when other chunk holds decimals or missing values.
+    Columns are identified by position.
+    """
+
+    _NUMERIC_KINDS = {'integer', 'floating', 'mixed-integer-float'}
+
+    def __init__(self):
+        self._kinds = []
+        self._with_missing = set()
+
+    @property
+    def width(self):
+        return len(self._kinds)
+
+    def add(self, chunk: pd.DataFrame):
+        for position, (_, column) in enumerate(chunk.items()):
+            if position == len(self._kinds):
+                self._kinds.append(set())
+            missing = column.isna()
+            if missing.any():
+                self._with_missing.add(position)
+            if not missing.all():
+                self._kinds[position].add(pd.api.types.infer_dtype(column, skipna=True))
+
+    def common(self) -> dict:
+        """
+        Dtypes of columns typed differently across chunks, other columns are left to the parser.
+        """
+        dtypes = {}
+        for position, kinds in enumerate(self._kinds):
+            if kinds == {'integer'} and position in self._with_missing:
+                dtypes[position] = 'float64'
+            elif len(kinds) > 1 and kinds <= self._NUMERIC_KINDS:
+                dtypes[position] = 'float64'
+            elif len(kinds) > 1:
+                # Mixed columns are left unconverted by a single read as well
+                dtypes[position] = object
+        return dtypes
+
+
+def _read_workbook_rows_in_chunks(import_file, chunk_size: int, width: int = 0, dtype: dict = None):
+    rows = _read_workbook_rows(import_file)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    buffer = []
+    blank_rows = 0
+    for row in rows:
+        if not row:
+            # pd.read_excel keeps empty rows unless they are trailing
+            blank_rows += 1
+            continue
+        for pending_row in [[]] * blank_rows + [row]:
+            buffer.append(pending_row)
+            if len(buffer) >= chunk_size:
+                yield _parse_workbook_rows(header, buffer, width, dtype)
+                buffer = []
+        blank_rows = 0
+    if buffer:
+        yield _parse_workbook_rows(header, buffer, width, dtype)
+
+
+def _read_workbook_rows(import_file):
+    # Cells are converted as by the openpyxl reader of pd.read_excel, trailing empty cells of a row are dropped
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    import_file.seek(0)
+    workbook = load_workbook(import_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        for row in sheet.rows:
+            values = []
+            for cell in row:
+                if cell.value is None:
+                    values.append("")
+                elif cell.data_type == TYPE_ERROR:
+                    values.append(np.nan)
+                elif cell.data_type == TYPE_NUMERIC and int(cell.value) == cell.value:
+                    values.append(int(cell.value))
+                elif cell.data_type == TYPE_NUMERIC:
+                    values.append(float(cell.value))
+                else:
+                    values.append(cell.value)
+            while values and values[-1] == "":
+                values.pop()
+            yield values
+    finally:
+        workbook.close()
+
+
+def _parse_workbook_rows(header, rows, width, dtype):
+    # Rows are padded to the width of the widest row, extra columns are named the same way as by pd.read_excel
+    width = max([width, len(header)] + [len(row) for row in rows])
+    data = [list(row) + [""] * (width - len(row)) for row in [header] + rows]
+    return TextParser(data, header=0, skip_blank_lines=False, dtype=dtype).read()
+
+
+def bulk_insert_instances(model, instances: List[models.Model], batch_size: int = None):
+    """
+    Inserts unsaved model instances with COPY ... FROM STDIN on PostgreSQL, one COPY per batch_size instances,
+    so only a single batch is serialized in memory at a time.
+    Other databases fall back to bulk_create in batches of batch_size.
+    Same as bulk_create, neither save() nor signals are called for the instances.
+    """
+    if not instances:
+        return
+
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(instances, batch_size=batch_size)
+        return
+
+    fields = model._meta.concrete_fields
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) " \
+          f"FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')"
+    batch_size = batch_size or len(instances)
+    with connection.cursor() as cursor:
+        for start in range(0, len(instances), batch_size):
+            buffer = io.StringIO()
+            for instance in instances[start:start + batch_size]:
+                _write_copy_row(buffer, [_copy_value(field, instance) for field in fields])
+            buffer.seek(0)
+            _copy_from_buffer(cursor, sql, buffer)
+
+
+def bulk_update_field(model, field_name: str, values: Iterable[Tuple[Any, Any]], batch_size: int = None) -> int:
+    """
+    Sets field_name of the rows identified by primary keys to the given values, values are (pk, value) pairs.
+    Rows that already hold the value are not updated. Returns the number of updated rows.
+    On PostgreSQL values are copied into a temporary table and applied with a single UPDATE ... FROM,
+    other databases fall back to bulk_update of changed rows in batches of batch_size.
+    Same as bulk_update, neither save() nor signals are called and the history is not updated.
+    """
+    pk_field = model._meta.pk
+    field = model._meta.get_field(field_name)
+    values = [(pk_field.to_python(pk), value) for pk, value in values]
+    if not values:
+        return 0
+
+    if connection.vendor != 'postgresql':
+        return _bulk_update_changed(model, field, values, batch_size)
+
+    buffer = io.StringIO()
+    for pk, value in values:
+        _write_copy_row(buffer, [_copy_field_value(pk_field, pk), _copy_field_value(field, value)])
+    buffer.seek(0)
+
+    quote_name = connection.ops.quote_name
+    temp_table = quote_name(f"tmp_bulk_update_{uuid.uuid4().hex}")
+    table = quote_name(model._meta.db_table)
+    pk_column = quote_name(pk_field.column)
+    column = quote_name(field.column)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {temp_table} "
+            f"(pk {pk_field.db_type(connection)} PRIMARY KEY, value {field.db_type(connection)})"
+        )
+        _copy_from_buffer(cursor, f"COPY {temp_table} (pk, value) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')",
+                          buffer)
+        cursor.execute(
+            f"UPDATE {table} SET {column} = tmp.value FROM {temp_table} AS tmp "
+            f"WHERE {table}.{pk_column} = tmp.pk AND {table}.{column} IS DISTINCT FROM tmp.value"
+        )
+        updated = cursor.rowcount
+        cursor.execute(f"DROP TABLE {temp_table}")
+    return updated
+
+
+def _bulk_update_changed(model, field, values, batch_size):
+    pks = [pk for pk, _ in values]
+    batch_size = batch_size or len(pks)
+    current = {}
+    for start in range(0, len(pks), batch_size):
+        current.update(model.objects.filter(pk__in=pks[start:start + batch_size]).values_list('pk', field.attname))
+
+    changed = [
+        model(**{'pk': pk, field.attname: value})
+        for pk, value in values
+        if pk in current and current[pk] != value
+    ]
+    if changed:
+        model.objects.bulk_update(changed, [field.name], batch_size=batch_size)
+    return len(changed)
+
+
+class JSONBRemoveKeys(Func):
+    """
+    jsonb - text[], removes top level keys of a JSON field in the database, e.g.
+    queryset.update(json_ext=JSONBRemoveKeys('json_ext', ['group_code'])). PostgreSQL only.
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ' - '
+    output_field = models.JSONField()
+
+    def __init__(self, expression, keys: List[str], **extra):
+        super().__init__(expression, Value(list(keys)), **extra)
+
+
+class JSONBMerge(Func):
+    """
+    jsonb || jsonb, merges top level keys of JSON objects in the database, keys of the later ones take precedence.
+    NULL fields are merged as empty objects, e.g.
+    queryset.update(json_ext=JSONBMerge('json_ext', JSONObject(report_synch=Value('true')))). PostgreSQL only.
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ' || '
+    output_field = models.JSONField()
+
+    def __init__(self, *expressions, **extra):
+        super().__init__(
+            *(Coalesce(expression, Value({}, output_field=models.JSONField())) for expression in expressions), **extra
+        )
+
+
+def _copy_value(field, instance):
+    return _copy_field_value(field, field.pre_save(instance, add=True))
+
+
+def _copy_field_value(field, value):
+    if value is None:
+        return None
+    if isinstance(field, models.JSONField):
+        return json.dumps(value, cls=field.encoder)
+    return field.get_db_prep_save(value, connection)
+
+
+def _write_copy_row(buffer, values):
+    # Every value is quoted, so only the bare NULL marker is read as NULL and text equal to it is kept
+    buffer.write(",".join(
+        _COPY_NULL if value is None else '"' + str(value).replace('"', '""') + '"' for value in values
+    ))
+    buffer.write("\n")
+
+
+def _copy_from_buffer(cursor, sql, buffer):
+    if hasattr(cursor.cursor, 'copy_expert'):
+        # psycopg2
+        cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with cursor.cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+class UploadStageMetrics:
+    """
+    Records progress of a single import stage in IndividualDataSourceUpload.metrics, e.g.
+    {"validation": {"rows_total": 1000, "rows_processed": 400, "wall_time": 2.5, "rows_per_second": 160.0, ...}}.
+    Metrics are written with a queryset update, so they don't create upload history entries. Updates made inside
+    a transaction become visible to other connections once it's committed.
+    The stage is recorded as failed if it raises, or if failed is set before the stage exits without an exception.
+    """
+
+    def __init__(self, upload, stage: str, rows_total: int = None):
+        # upload can be either an instance or its id, the instance metrics are kept in sync with the database
+        self.upload = upload if isinstance(upload, IndividualDataSourceUpload) else None
+        self.upload_id = upload.id if self.upload else upload
+        self.stage = stage
+        self.rows_total = rows_total
+        self.rows_processed = 0
+        self.failed = False
+        self._started = None
+        self._started_at = None
+
+    def __enter__(self):
+        self._started = time.monotonic()
+        self._started_at = timezone.now().isoformat()
+        self._write()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # finished_at of a failed stage is left unset
+        failed = self.failed or exc_type is not None
+        self._write(finished=not failed, failed=failed)
+        return False
+
+    def advance(self, rows: int):
+        self.rows_processed += rows
+        self._write()
+
+    def as_dict(self, finished=False, failed=False):
+        wall_time = time.monotonic() - self._started
+        return {
+            'rows_total': self.rows_total,
+            'rows_processed': self.rows_processed,
+            'wall_time': round(wall_time, 3),
+            'rows_per_second': round(self.rows_processed / wall_time, 2) if wall_time > 0 else None,
+            'started_at': self._started_at,
+            'finished_at': timezone.now().isoformat() if finished else None,
+            'failed': failed,
+        }
+
+    def _write(self, finished=False, failed=False):
+        stage_metrics = self.as_dict(finished, failed)
+        uploads = IndividualDataSourceUpload.objects.filter(id=self.upload_id)
+        if connection.vendor == 'postgresql':
+            # Only the key of the stage is replaced, stages written concurrently by other processes are kept
+            uploads.update(metrics=JSONBMerge(
+                'metrics', Value({self.stage: stage_metrics}, output_field=models.JSONField())
+            ))
+        else:
+            metrics = uploads.values_list('metrics', flat=True).first() or {}
+            metrics[self.stage] = stage_metrics
+            uploads.update(metrics=metrics)
+        # Cached upload would be returned by objects.get() and its save() would write the old metrics back
+        IndividualDataSourceUpload.bulk_update_cache(list(uploads.all()))
+        if self.upload:
+            self.upload.metrics = {**(self.upload.metrics or {}), self.stage: stage_metrics}
+
+
 def fetch_summary_of_broken_items(upload_id):
     return list(IndividualDataSource.objects.filter(
         Q(is_deleted=False) &
@@ -31,3 +390,14 @@ def fetch_summary_of_valid_items(upload_id):
         Q(upload_id=upload_id) &
         Q(validations__validation_errors=[])
     ).values_list('uuid', flat=True))
+
+
+def fetch_data_source_headers(upload_id) -> Set[str]:
+    """
+    Columns of the DataFrame returned by load_dataframe for the upload, i.e. keys of json_ext of its data sources
+    and 'id', computed by the database without loading the data sources. PostgreSQL only.
+    """
+    keys = IndividualDataSource.objects.filter(upload_id=upload_id).order_by().annotate(
+        key=Func(F('json_ext'), function='jsonb_object_keys', output_field=models.CharField())
+    ).values_list('key', flat=True).distinct()
+    return {*keys, 'id'}
@@ -1,5 +1,4 @@
 import logging
-import json
 
 import numpy as np
 import pandas as pd
@@ -12,21 +11,17 @@ from rest_framework.response import Response
 from core.utils import DefaultStorageFileHandler
 from im_export.views import check_user_rights
 from individual.apps import IndividualConfig
+from individual.compiled_schema import get_individual_schema
 from individual.models import IndividualDataSource
-from individual.services import IndividualImportService
+from individual.services import IndividualImportService, get_workflow
 
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from workflow.services import WorkflowService
-
 logger = logging.getLogger(__name__)
 
 
 def get_global_schema_fields():
-    schema = json.loads(IndividualConfig.individual_schema)
-    schema_properties = set(schema.get('properties', {}).keys())
-    schema_properties.update(['recipient_info', 'individual_role', 'group_code'])
-    return list(schema_properties)
+    return list(get_individual_schema().header_whitelist)
 
 
 @api_view(["GET"])
@@ -60,7 +55,11 @@ def import_individuals(request):
         user = request.user
         import_file, workflow, group_aggregation_column = _resolve_import_individuals_args(request)
         _handle_file_upload(import_file)
-        result = IndividualImportService(user).import_individuals(import_file, workflow, group_aggregation_column)
+        service = IndividualImportService(user)
+        if IndividualConfig.enable_async_import:
+            result = service.import_individuals_async(import_file, workflow, group_aggregation_column)
+        else:
+            result = service.import_individuals(import_file, workflow, group_aggregation_column)
         if not result.get('success'):
             raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
 
@@ -168,17 +167,6 @@ def _resolve_import_individuals_args(request):
     if not workflow_group:
         raise ValueError(f'Workflow group not provided')
 
-    result = WorkflowService.get_workflows(workflow_name, workflow_group)
-    if not result.get('success'):
-        raise ValueError('{}: {}'.format(result.get("message"), result.get("details")))
-
-    workflows = result.get('data', {}).get('workflows')
-
-    if not workflows:
-        raise ValueError('Workflow not found: group={} name={}'.format(workflow_group, workflow_name))
-    if len(workflows) > 1:
-        raise ValueError('Multiple workflows found: group={} name={}'.format(workflow_group, workflow_name))
-
-    workflow = workflows[0]
+    workflow = get_workflow(workflow_name, workflow_group)
 
     return import_file, workflow, group_aggregation_column
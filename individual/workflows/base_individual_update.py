@@ -1,7 +1,7 @@
 import logging
 
 from core.models import User
-from individual.workflows.utils import DataUpdateWorkflow
+from individual.workflows.utils import DataUpdateWorkflow, UNAMBIGUOUS_VILLAGES_SQL
 from individual.services import IndividualImportService
 
 logger = logging.getLogger(__name__)
@@ -84,11 +84,9 @@ BEGIN
             "DateUpdated" = NOW(),
             "Json_ext" = f."Json_ext"
             FROM individual_individualdatasource f
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = f."Json_ext"->>'location_name'
                     AND loc."LocationCode" = f."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE individual_individual."UUID" = (f."Json_ext" ->> 'ID')::UUID
             returning individual_individual."UUID", f."UUID" as "individualdatasource_id")
 
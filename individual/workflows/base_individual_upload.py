@@ -1,7 +1,7 @@
 import logging
 
 from core.models import User
-from individual.workflows.utils import DataUploadWorkflow
+from individual.workflows.utils import DataUploadWorkflow, UNAMBIGUOUS_VILLAGES_SQL
 from individual.services import IndividualImportService
 
 logger = logging.getLogger(__name__)
@@ -67,11 +67,9 @@ DO $$
                 to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD'),
                 loc."LocationId"
             FROM individual_individualdatasource AS ds
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = ds."Json_ext"->>'location_name'
                     AND loc."LocationCode" = ds."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE ds.upload_id=current_upload_id 
                 AND ds.individual_id is null
                 AND ds."isDeleted"=False
@@ -1,7 +1,7 @@
 import logging
 
 from core.models import User
-from individual.workflows.utils import SqlProcedurePythonWorkflow
+from individual.workflows.utils import SqlProcedurePythonWorkflow, UNAMBIGUOUS_VILLAGES_SQL
 from individual.services import IndividualImportService
 
 logger = logging.getLogger(__name__)
@@ -89,11 +89,9 @@ BEGIN
                 "DateUpdated" = NOW(),
                 "Json_ext" = ids."Json_ext"
             FROM individual_individualdatasource ids 
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = ids."Json_ext"->>'location_name'
                     AND loc."LocationCode" = ids."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE individual_individual."UUID" = (ids."Json_ext" ->> 'ID')::UUID
             AND ids.upload_id = current_upload_id
             AND validations ->> 'validation_errors' = '[]'
@@ -212,11 +210,9 @@ BEGIN
                 "DateUpdated" = NOW(),
                 "Json_ext" = ids."Json_ext"
             FROM individual_individualdatasource ids
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = ids."Json_ext"->>'location_name'
                     AND loc."LocationCode" = ids."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE individual_individual."UUID" = (ids."Json_ext" ->> 'ID')::UUID 
             AND ids.upload_id = current_upload_id
             AND (ids."UUID" = ANY(accepted))
@@ -1,7 +1,8 @@
 import logging
 
 from core.models import User
-from individual.workflows.utils import SqlProcedurePythonWorkflow
+from individual.apps import IndividualConfig
+from individual.workflows.utils import ChunkedImportSql, SqlProcedurePythonWorkflow, UNAMBIGUOUS_VILLAGES_SQL
 from individual.services import IndividualImportService
 
 logger = logging.getLogger(__name__)
@@ -13,6 +14,8 @@ def process_import_valid_individuals_workflow(user_uuid, upload_uuid, accepted=N
     service.validate_dataframe_headers()
     if isinstance(accepted, list):
         service.execute(upload_sql_partial, [upload_uuid, user_uuid, accepted])
+    elif IndividualConfig.import_workflow_chunk_size:
+        service.execute_in_chunks(upload_sql_chunked, IndividualConfig.import_workflow_chunk_size)
     else:
         service.execute(upload_sql, [upload_uuid, user_uuid])
     IndividualImportService(user).synchronize_data_for_reporting(upload_uuid)
@@ -74,11 +77,9 @@ BEGIN
                    to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD'),
                    loc."LocationId"
             FROM individual_individualdatasource AS ds
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = ds."Json_ext"->>'location_name'
                     AND loc."LocationCode" = ds."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE ds.upload_id = current_upload_id
                 AND ds.individual_id IS NULL 
                 AND ds."isDeleted" = False 
@@ -192,11 +193,9 @@ BEGIN
                    to_date("Json_ext" ->> 'dob', 'YYYY-MM-DD'),
                    loc."LocationId"
             FROM individual_individualdatasource AS ds
-            LEFT JOIN "tblLocations" AS loc
+            LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
                     ON loc."LocationName" = ds."Json_ext"->>'location_name'
                     AND loc."LocationCode" = ds."Json_ext"->>'location_code'
-                    AND loc."LocationType"='V'
-                    AND loc."ValidityTo" IS NULL
             WHERE ds.upload_id = current_upload_id 
                 AND ds.individual_id IS NULL
                 AND ds."isDeleted" = False
@@ -223,3 +222,97 @@ EXCEPTION WHEN OTHERS THEN
     WHERE "UUID" = current_upload_id;
 END $$;
 """
+
+# Same import as upload_sql, executed by SqlProcedurePythonWorkflow.execute_in_chunks
+upload_sql_chunked = ChunkedImportSql(
+    validation="""
+WITH failing_entries AS (
+    SELECT
+        ARRAY_AGG("UUID") FILTER (WHERE NOT "Json_ext" ? 'first_name') AS first_name,
+        ARRAY_AGG("UUID") FILTER (WHERE NOT "Json_ext" ? 'last_name') AS last_name,
+        ARRAY_AGG("UUID") FILTER (WHERE NOT "Json_ext" ? 'dob') AS dob,
+        ARRAY_AGG("UUID") FILTER (WHERE NOT validate_json_schema(NULL::jsonb, "Json_ext")) AS invalid_json
+    FROM individual_individualdatasource
+    WHERE upload_id = %(upload_id)s::UUID AND individual_id IS NULL AND "isDeleted" = False
+)
+UPDATE individual_individualdatasourceupload
+SET status = 'FAIL',
+    error = coalesce(error, '{}'::jsonb) || jsonb_build_object('errors', jsonb_build_object(
+                'error', 'Invalid entries',
+                'timestamp', NOW()::text,
+                'upload_id', %(upload_id)s::text,
+                'failing_entries_first_name', fe.first_name,
+                'failing_entries_last_name', fe.last_name,
+                'failing_entries_dob', fe.dob,
+                'failing_entries_invalid_json', fe.invalid_json
+            ))
+FROM failing_entries fe
+WHERE "UUID" = %(upload_id)s::UUID
+    AND (fe.invalid_json IS NOT NULL OR fe.first_name IS NOT NULL OR fe.last_name IS NOT NULL OR fe.dob IS NOT NULL)
+RETURNING "UUID";
+""",
+    chunk="""
+WITH chunk AS (
+    -- Ids of the new individuals are generated upfront, data sources are linked by them instead of Json_ext
+    SELECT ds."UUID" AS data_source_id, gen_random_uuid() AS individual_id, ds."Json_ext"
+    FROM individual_individualdatasource AS ds
+    WHERE ds.upload_id = %(upload_id)s::UUID
+        AND ds.individual_id IS NULL
+        AND ds."isDeleted" = False
+        AND ds.validations ->> 'validation_errors' = '[]'
+        AND (%(last_id)s::UUID IS NULL OR ds."UUID" > %(last_id)s::UUID)
+    ORDER BY ds."UUID"
+    LIMIT %(chunk_size)s
+),
+new_entry AS (
+    INSERT INTO individual_individual(
+        "UUID", "isDeleted", version, "UserCreatedUUID", "UserUpdatedUUID",
+        "Json_ext", first_name, last_name, dob, location_id
+    )
+    SELECT chunk.individual_id, false, 1, %(user_id)s::UUID, %(user_id)s::UUID,
+           chunk."Json_ext",
+           chunk."Json_ext" ->> 'first_name',
+           chunk."Json_ext" ->> 'last_name',
+           to_date(chunk."Json_ext" ->> 'dob', 'YYYY-MM-DD'),
+           loc."LocationId"
+    FROM chunk
+    LEFT JOIN (""" + UNAMBIGUOUS_VILLAGES_SQL + """) AS loc
+            ON loc."LocationName" = chunk."Json_ext" ->> 'location_name'
+            AND loc."LocationCode" = chunk."Json_ext" ->> 'location_code'
+),
+linked_entry AS (
+    UPDATE individual_individualdatasource AS ds
+    SET individual_id = chunk.individual_id
+    FROM chunk
+    WHERE ds."UUID" = chunk.data_source_id
+)
+SELECT count(*), (ARRAY_AGG(data_source_id ORDER BY data_source_id DESC))[1]
+FROM chunk;
+""",
+    finalization="""
+UPDATE individual_individualdatasourceupload
+SET
+    status = CASE
+        WHEN entries.total_valid_entries = entries.total_entries THEN 'SUCCESS'
+        ELSE 'PARTIAL_SUCCESS'
+    END,
+    error = CASE
+        WHEN entries.total_valid_entries < entries.total_entries THEN jsonb_build_object(
+            'error', 'Partial success due to some invalid entries',
+            'timestamp', NOW()::text,
+            'upload_id', %(upload_id)s::text,
+            'total_valid_entries', entries.total_valid_entries,
+            'total_entries', entries.total_entries
+        )
+        ELSE '{}'
+    END
+FROM (
+    SELECT
+        count(*) FILTER (WHERE COALESCE(validations ->> 'validation_errors', '[]') = '[]') AS total_valid_entries,
+        count(*) AS total_entries
+    FROM individual_individualdatasource
+    WHERE upload_id = %(upload_id)s::UUID AND "isDeleted" = FALSE
+) AS entries
+WHERE "UUID" = %(upload_id)s::UUID;
+""",
+)
@@ -1,22 +1,52 @@
 """
 Functionalities shared between different python workflows.
 """
-import json
 import logging
 from abc import ABCMeta, abstractmethod
-from typing import Iterable
+from typing import Iterable, NamedTuple
 
-from django.db import ProgrammingError, connection
+from django.db import DatabaseError, ProgrammingError, connection, models, transaction
+from django.db.models import Value
+from django.utils import timezone
 
 from core.models import User
 from individual.apps import IndividualConfig
-from individual.models import IndividualDataSource
+from individual.compiled_schema import get_individual_schema
+from individual.location_ancestry import refresh_location_ancestry
+from individual.models import Individual, IndividualDataSource, IndividualDataSourceUpload
 from individual.services import IndividualImportService
-from individual.utils import load_dataframe
+from individual.utils import fetch_data_source_headers, load_dataframe, UploadStageMetrics, JSONBMerge, \
+    JSONBRemoveKeys
 from workflow.exceptions import PythonWorkflowHandlerException
 
 logger = logging.getLogger(__name__)
 
+# Villages of the import identified by name and code, used by the workflow SQL. Same as in the import validation
+# (see individual.location_cache.get_village_index), villages sharing the name and code are left out as ambiguous
+UNAMBIGUOUS_VILLAGES_SQL = """
+    SELECT "LocationName", "LocationCode", MIN("LocationId") AS "LocationId"
+    FROM "tblLocations"
+    WHERE "LocationType" = 'V' AND "ValidityTo" IS NULL
+    GROUP BY "LocationName", "LocationCode"
+    HAVING COUNT(*) = 1
+"""
+
+# Key of IndividualDataSourceUpload.json_ext holding progress of an import executed in chunks
+IMPORT_CHECKPOINT_KEY = 'import_checkpoint'
+
+
+class ChunkedImportSql(NamedTuple):
+    """
+    SQL of an import executed in chunks, see SqlProcedurePythonWorkflow.execute_in_chunks.
+    Statements take upload_id, user_id, last_id and chunk_size named parameters.
+    """
+    # Marks the upload as failed if its data sources can't be imported, returns a row in such case
+    validation: str
+    # Imports chunk_size data sources ordered by id after last_id, returns their count and the last id
+    chunk: str
+    # Sets the final status of the upload
+    finalization: str
+
 
 class BasePythonWorkflowExecutor(metaclass=ABCMeta):
 
@@ -25,12 +55,32 @@ class BasePythonWorkflowExecutor(metaclass=ABCMeta):
         self.user_uuid = user_uuid
         self.user = User.objects.get(id=self.user_uuid)
         self.accepted = accepted
-        self._load_df()
+        self.schema = get_individual_schema().schema
+        self._df = None
+        self._headers = None
+
+    @property
+    def df(self):
+        """
+        Data sources of the upload, loaded on first access. Workflows that only check the headers don't load them.
+        """
+        if self._df is None:
+            self._df = self.clean_data(load_dataframe(IndividualDataSource.objects.filter(upload_id=self.upload_uuid)))
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
 
-    def _load_df(self):
-        df = load_dataframe(IndividualDataSource.objects.filter(upload_id=self.upload_uuid))
-        self.df = self.clean_data(df)
-        self.schema = json.loads(IndividualConfig.individual_schema)
+    @property
+    def headers(self):
+        if self._df is not None:
+            return set(self._df.columns)
+        if self._headers is None:
+            self._headers = fetch_data_source_headers(self.upload_uuid)
+            # Same as clean_data does for the DataFrame
+            self._headers.discard('Unnamed: 0')
+        return self._headers
 
     @staticmethod
     def clean_data(df):
@@ -49,9 +99,8 @@ class BasePythonWorkflowExecutor(metaclass=ABCMeta):
         3. 'id' is field automatically added to DataFrame which is used for upload.
         4. If action is data upload then 'ID' unique identifier is required as well.
         """
-        df_headers = set(self.df.columns)
-        schema_properties = set(self.schema.get('properties', {}).keys())
-        schema_properties.update(['recipient_info', 'group_code', 'individual_role'])
+        df_headers = self.headers
+        schema_properties = get_individual_schema().header_whitelist
         required_headers = set(IndividualConfig.individual_base_fields)
         if is_update:
             required_headers.add('ID')
@@ -95,7 +144,11 @@ class SqlProcedurePythonWorkflow(BasePythonWorkflowExecutor):
             raise PythonWorkflowHandlerException(str(e))
 
     def _execute_sql_logic(self, sql_func: str, params: Iterable):
-        with connection.cursor() as cursor:
+        # Partial workflows process only accepted data sources
+        rows_total = len(self.accepted) if isinstance(self.accepted, list) \
+            else IndividualDataSource.objects.filter(upload_id=self.upload_uuid).count()
+        with UploadStageMetrics(self.upload_uuid, 'workflow', rows_total=rows_total) as stage_metrics, \
+                connection.cursor() as cursor:
             current_upload_id = self.upload_uuid
             userUUID = self.user_uuid
             accepted = self.accepted
@@ -105,6 +158,73 @@ class SqlProcedurePythonWorkflow(BasePythonWorkflowExecutor):
                 sql_func, params
             )
             # Process the cursor results or handle exceptions
+            # Locations are assigned by the SQL, their ancestors are filled in for the individuals of the upload
+            refresh_location_ancestry(Individual.objects.filter(individualdatasource__upload_id=self.upload_uuid))
+            stage_metrics.advance(rows_total)
+
+
+    def execute_in_chunks(self, sql: ChunkedImportSql, chunk_size: int):
+        """
+        Imports the data sources of the upload in chunks ordered by id. Every chunk is committed together with
+        the checkpoint in json_ext of the upload, so a failed import resumes from the last committed chunk
+        once the workflow is executed again.
+        """
+        params = {'upload_id': str(self.upload_uuid), 'user_id': str(self.user_uuid), 'chunk_size': chunk_size}
+        uploads = IndividualDataSourceUpload.objects.filter(id=self.upload_uuid)
+        checkpoint = (uploads.values_list('json_ext', flat=True).first() or {}).get(IMPORT_CHECKPOINT_KEY, {})
+        rows_total = IndividualDataSource.objects.filter(
+            upload_id=self.upload_uuid, individual__isnull=True, is_deleted=False, validations__validation_errors=[]
+        ).count()
+        try:
+            with UploadStageMetrics(self.upload_uuid, 'workflow', rows_total=rows_total) as stage_metrics:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql.validation, params)
+                    if cursor.fetchone():
+                        # Upload is marked FAIL by the validation
+                        stage_metrics.failed = True
+                        return
+
+                while True:
+                    with transaction.atomic():
+                        imported = self._execute_chunk(sql.chunk, params, checkpoint)
+                    if not imported:
+                        break
+                    stage_metrics.advance(imported)
+
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(sql.finalization, params)
+                    uploads.update(json_ext=JSONBRemoveKeys('json_ext', [IMPORT_CHECKPOINT_KEY]))
+        except DatabaseError as e:
+            # Same as the exception handler of the workflow procedures, committed chunks are kept
+            logger.error(F'Error during individuals upload workflow, details:\n{str(e)}')
+            uploads.update(status=IndividualDataSourceUpload.Status.FAIL, error={
+                'error': str(e),
+                'timestamp': str(timezone.now()),
+                'upload_id': str(self.upload_uuid),
+            })
+        except Exception as e:
+            raise PythonWorkflowHandlerException(str(e))
+
+    def _execute_chunk(self, sql, params, checkpoint):
+        last_id = checkpoint.get('last_id')
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {**params, 'last_id': last_id})
+            imported, chunk_last_id = cursor.fetchone()
+        if not imported:
+            return 0
+
+        # Locations are assigned by the SQL, their ancestors are filled in for the individuals of the chunk
+        chunk_sources = IndividualDataSource.objects.filter(upload_id=self.upload_uuid, id__lte=chunk_last_id)
+        if last_id:
+            chunk_sources = chunk_sources.filter(id__gt=last_id)
+        refresh_location_ancestry(Individual.objects.filter(id__in=chunk_sources.values('individual_id')))
+
+        checkpoint['last_id'] = str(chunk_last_id)
+        checkpoint['rows_imported'] = checkpoint.get('rows_imported', 0) + imported
+        IndividualDataSourceUpload.objects.filter(id=self.upload_uuid).update(json_ext=JSONBMerge(
+            'json_ext', Value({IMPORT_CHECKPOINT_KEY: checkpoint}, output_field=models.JSONField())
+        ))
+        return imported
 
 
 class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=ABCMeta):
@@ -116,6 +236,8 @@ class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=A
     If the uploaded dataset is invalid in terms of the calculation rules validation, then new task is created.
     New task is also created in case maker-checker logic is enabled in the config.
     """
+    _validation_response = None
+
     @property
     def should_create_task(self) -> bool:
         """
@@ -130,6 +252,19 @@ class MakerCheckerPythonWorkflowExecutor(SqlProcedurePythonWorkflow, metaclass=A
         """
         raise NotImplementedError()
 
+    def _validate_upload(self):
+        """
+        Validates the upload with the import service of the workflow, reusing the DataFrame of the executor.
+        Result is kept, so the upload is validated once even if should_create_task is evaluated more than once.
+        """
+        if self._validation_response is None:
+            self._validation_response = self.import_service.validate_import_individuals(
+                upload_id=self.upload_uuid,
+                individual_sources=IndividualDataSource.objects.filter(upload_id=self.upload_uuid),
+                dataframe=self.df,
+            )
+        return self._validation_response
+
     def execute(self, sql):
         try:
             if self.should_create_task:
@@ -157,10 +292,7 @@ class DataUploadWorkflow(MakerCheckerPythonWorkflowExecutor):
 
     @property
     def should_create_task(self):
-        validation_response = self.import_service.validate_import_individuals(
-            upload_id=self.upload_uuid,
-            individual_sources=IndividualDataSource.objects.filter(upload_id=self.upload_uuid)
-        )
+        validation_response = self._validate_upload()
         return validation_response['summary_invalid_items'] or True  # Replace this with config check
 
     def _create_task_function(self):
@@ -175,10 +307,7 @@ class DataUpdateWorkflow(MakerCheckerPythonWorkflowExecutor):
 
     @property
     def should_create_task(self):
-        validation_response = self.import_service.validate_import_individuals(
-            upload_id=self.upload_uuid,
-            individual_sources=IndividualDataSource.objects.filter(upload_id=self.upload_uuid)
-        )
+        validation_response = self._validate_upload()
         return validation_response['summary_invalid_items'] or True  # Replace this with config check
 
     def _create_task_function(self):